@@ -77,9 +77,9 @@ rule build_bus_regions:
         regions_offshore=RESOURCES + "{interconnect}/regions_offshore.geojson",
     log:
         "logs/build_bus_regions/{interconnect}.log",
-    threads: 1
+    threads: 4
     resources:
-        mem_mb=1000,
+        mem_mb=4000,
     script:
         "../scripts/build_bus_regions.py"
 
@@ -101,6 +101,8 @@ rule build_cost_data:
 
 ATLITE_NPROCESSES = config["atlite"].get("nprocesses", 4)
 
+NATIONAL_CUTOUT = config["atlite"].get("national_cutout")
+
 if config["enable"].get("build_cutout", False):
 
     rule build_cutout:
@@ -111,6 +113,11 @@ if config["enable"].get("build_cutout", False):
         input:
             regions_onshore=RESOURCES + "{interconnect}/country_shapes.geojson",
             regions_offshore=RESOURCES + "{interconnect}/offshore_shapes.geojson",
+            national=lambda w: (
+                "cutouts/" + CDIR + NATIONAL_CUTOUT + "_{cutout}.nc"
+                if NATIONAL_CUTOUT and w.interconnect != NATIONAL_CUTOUT
+                else []
+            ),
         output:
             protected("cutouts/" + CDIR + "{interconnect}_{cutout}.nc"),
         log:
@@ -227,18 +234,118 @@ rule build_renewable_profiles:
         "../scripts/build_renewable_profiles.py"
 
 
+RENEWABLE_PROFILE_CARRIERS = [
+    carrier
+    for carrier in config["electricity"]["renewable_carriers"]
+    if carrier != "hydro"
+]
+
+
+def combined_renewable_profile_inputs(wildcards):
+    renewable = {tech: config["renewable"][tech] for tech in RENEWABLE_PROFILE_CARRIERS}
+    interconnect = wildcards.interconnect
+    inputs = dict(
+        base_network=RESOURCES + f"{interconnect}/elec_base_network.nc",
+        corine=ancient(
+            DATA
+            + "copernicus/PROBAV_LC100_global_v3.0.1_2019-nrt_Discrete-Classification-map_USA_EPSG-4326.tif"
+        ),
+        country_shapes=RESOURCES + f"{interconnect}/country_shapes.geojson",
+        offshore_shapes=RESOURCES + f"{interconnect}/offshore_shapes.geojson",
+        cec_onwind="repo_data/CEC_Wind_BaseScreen_epsg3310.tif",
+        cec_solar="repo_data/CEC_Solar_BaseScreen_epsg3310.tif",
+        boem_osw="repo_data/boem_osw_planning_areas.tif",
+    )
+    if any(params["natura"] for params in renewable.values()):
+        inputs["natura"] = DATA + "natura.tiff"
+    if any(params.get("max_depth") for params in renewable.values()):
+        inputs["gebco"] = ancient(
+            DATA + "gebco/gebco_2023_n55.0_s10.0_w-126.0_e-65.0.tif"
+        )
+    if any("ship_threshold" in params for params in renewable.values()):
+        inputs["ship_density"] = RESOURCES + f"{interconnect}/shipdensity_raster.tif"
+    for tech, params in renewable.items():
+        regions = "onshore" if tech in ("onwind", "solar") else "offshore"
+        inputs[f"regions_{tech}"] = (
+            RESOURCES + f"{interconnect}/regions_{regions}.geojson"
+        )
+        inputs[f"cutout_{tech}"] = (
+            "cutouts/" + CDIR + f"{interconnect}_" + params["cutout"] + ".nc"
+        )
+    return inputs
+
+
+if config["atlite"].get("combined_profiles", False):
+
+    ruleorder: build_renewable_profiles_combined > build_renewable_profiles
+
+    rule build_renewable_profiles_combined:
+        params:
+            renewable=config["renewable"],
+            snapshots=config["snapshots"],
+            technologies=RENEWABLE_PROFILE_CARRIERS,
+        input:
+            unpack(combined_renewable_profile_inputs),
+        output:
+            **{
+                f"profile_{tech}": RESOURCES + "{interconnect}" + f"/profile_{tech}.nc"
+                for tech in RENEWABLE_PROFILE_CARRIERS
+            },
+        log:
+            LOGS + "{interconnect}/build_renewable_profiles_combined.log",
+        benchmark:
+            BENCHMARKS + "{interconnect}/build_renewable_profiles_combined"
+        threads: ATLITE_NPROCESSES
+        resources:
+            mem_mb=ATLITE_NPROCESSES * 5000 + 5000 * len(RENEWABLE_PROFILE_CARRIERS),
+        script:
+            "../scripts/build_renewable_profiles.py"
+
+
+rule build_efs_dataset:
+    input:
+        efs=DATA + "nrel_efs/EFSLoadProfile_Reference_Moderate.csv",
+    output:
+        efs_dataset=directory(
+            RESOURCES + "nrel_efs/EFSLoadProfile_Reference_Moderate.parquet",
+        ),
+    log:
+        LOGS + "build_efs_dataset.log",
+    benchmark:
+        BENCHMARKS + "build_efs_dataset"
+    threads: 1
+    resources:
+        mem_mb=30000,
+    script:
+        "../scripts/build_efs_dataset.py"
+
+
+# without planning horizons, demand is built for the year of the snapshots
+DEMAND_HORIZONS = config["scenario"]["planning_horizons"] or [
+    int(str(config["snapshots"]["start"])[:4])
+]
+
+
 rule build_demand:
     params:
-        planning_horizons=config["scenario"]["planning_horizons"],
+        planning_horizons=DEMAND_HORIZONS,
         demand_params=config["electricity"]["demand"],
         snapshots=config["snapshots"],
         eia_api=config["api"]["eia"],
     input:
         base_network=RESOURCES + "{interconnect}/elec_base_network.nc",
         eia=expand(DATA + "GridEmissions/{file}", file=DATAFILES_GE),
-        efs=DATA + "nrel_efs/EFSLoadProfile_Reference_Moderate.csv",
+        efs=RESOURCES + "nrel_efs/EFSLoadProfile_Reference_Moderate.parquet",
     output:
-        demand=RESOURCES + "{interconnect}/demand.csv",
+        **{
+            f"demand_{year}": RESOURCES + "{interconnect}" + f"/demand_{year}.arrow"
+            for year in DEMAND_HORIZONS
+        },
+        **{
+            f"demand_csv_{year}": RESOURCES + "{interconnect}" + f"/demand_{year}.csv"
+            for year in DEMAND_HORIZONS
+            if config["electricity"]["demand"].get("export_csv", False)
+        },
     log:
         LOGS + "{interconnect}/build_demand.log",
     benchmark:
@@ -339,7 +446,8 @@ rule add_electricity:
             if config["network_configuration"] == "ads2032"
             else []
         ),
-        demand=RESOURCES + "{interconnect}/demand.csv",
+        # only the first planning horizon is attached to the network
+        demand=RESOURCES + "{interconnect}" + f"/demand_{DEMAND_HORIZONS[0]}.arrow",
         fuel_costs="repo_data/plants/fuelCost22.csv",
     output:
         RESOURCES + "{interconnect}/elec_base_network_l_pp.nc",
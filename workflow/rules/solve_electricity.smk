@@ -76,3 +76,54 @@ rule solve_network_operations:
         "../envs/environment.yaml"
     script:
         "../scripts/solve_network.py"
+
+
+rule solve_network_ensemble:
+    params:
+        solving=config["solving"],
+        foresight=config["foresight"],
+        planning_horizons=config["scenario"]["planning_horizons"],
+        co2_sequestration_potential=config["sector"].get(
+            "co2_sequestration_potential", 200
+        ),
+    input:
+        network=RESULTS
+        + "{interconnect}/networks/elec_s_{clusters}_ec_l{ll}_{opts}_{sector}.nc",
+        config=RESULTS + "config.yaml",
+        flowgates="repo_data/ReEDS_Constraints/transmission/transmission_capacity_init_AC_ba_NARIS2024.csv",
+        # produced outside the workflow by scripts/generate_stochastic_samples.py
+        bus_data=config_provider(
+            "solving",
+            "ensemble",
+            "bus_data",
+            default="sampled_data/sampled_bus_data.nc",
+        ),
+        generator_data=config_provider(
+            "solving",
+            "ensemble",
+            "generator_data",
+            default="sampled_data/sampled_generator_data.nc",
+        ),
+    output:
+        results=RESULTS
+        + "{interconnect}/ensemble/elec_s_{clusters}_ec_l{ll}_{opts}_{sector}.nc",
+    log:
+        solver=normpath(
+            LOGS
+            + "solve_network_ensemble/{interconnect}/elec_s_{clusters}_ec_l{ll}_{opts}_{sector}_solver.log"
+        ),
+        python=LOGS
+        + "solve_network_ensemble/{interconnect}/elec_s_{clusters}_ec_l{ll}_{opts}_{sector}_python.log",
+    benchmark:
+        (
+            BENCHMARKS
+            + "solve_network_ensemble/{interconnect}/elec_s_{clusters}_ec_l{ll}_{opts}_{sector}"
+        )
+    threads: 8
+    resources:
+        mem_mb=memory,
+        walltime=config["solving"].get("walltime", "12:00:00"),
+    conda:
+        "../envs/environment.yaml"
+    script:
+        "../scripts/solve_network.py"
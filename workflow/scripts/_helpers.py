@@ -15,7 +15,6 @@ import pandas as pd
 import pytz
 import requests
 import yaml
-from snakemake.utils import update_config
 from tqdm import tqdm
 
 REGION_COLS = ["geometry", "name", "x", "y", "country"]
@@ -473,6 +472,290 @@ def local_to_utc(group):
     return utc
 
 
+def file_checksum(file_path, hash_type="sha256"):
+    """
+    Calculates the hash of a file using 64KB chunks.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the file to hash.
+    hash_type : str, optional
+        Any algorithm supported by ``hashlib.new``.
+
+    Returns
+    -------
+    str
+        Hex digest of the file content.
+    """
+    hasher = hashlib.new(hash_type)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):  # 64kb chunks
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def geometry_checksum(geometries, hash_type="sha256"):
+    """
+    Calculates the hash of the well-known binary representation of geometries.
+
+    Parameters
+    ----------
+    geometries : gpd.GeoSeries | array_like of shapely.Geometry
+        Geometries to hash, their order is part of the hash.
+    hash_type : str, optional
+        Any algorithm supported by ``hashlib.new``.
+
+    Returns
+    -------
+    str
+        Hex digest of the geometries.
+    """
+    import numpy as np
+    import shapely
+
+    hasher = hashlib.new(hash_type)
+    for wkb in shapely.to_wkb(np.asarray(geometries)):
+        hasher.update(wkb)
+    return hasher.hexdigest()
+
+
+def cached_indicatormatrix(orig, dest, cache_dir=None, orig_crs=4326, dest_crs=4326):
+    """
+    Calculates the indicator matrix of the geometries ``dest`` over the
+    geometries ``orig`` with ``atlite.cutout.compute_indicatormatrix``.
+
+    With ``cache_dir`` the matrix is stored there in compressed sparse format
+    under a hash of both geometries and CRSs, and reused by every later call
+    with identical inputs, e.g. by the sector rules sharing a cutout grid and
+    the clustered regions.
+
+    Parameters
+    ----------
+    orig : gpd.GeoSeries
+        Geometries of the matrix columns, e.g. ``cutout.grid.geometry``.
+    dest : gpd.GeoSeries
+        Geometries of the matrix rows.
+    cache_dir : str, optional
+        Directory of the cached matrices, no caching if empty.
+    orig_crs, dest_crs : optional
+        CRS of ``orig`` and ``dest``.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        Matrix of shape (len(dest), len(orig)) with the overlap share of each
+        ``orig`` geometry in each ``dest`` geometry.
+    """
+    import atlite
+    from scipy import sparse
+
+    def compute():
+        matrix = atlite.cutout.compute_indicatormatrix(orig, dest, orig_crs, dest_crs)
+        return sparse.csr_matrix(matrix)
+
+    if not cache_dir:
+        return compute()
+
+    hasher = hashlib.sha256()
+    hasher.update(repr((str(orig_crs), str(dest_crs))).encode())
+    hasher.update(geometry_checksum(orig).encode())
+    hasher.update(geometry_checksum(dest).encode())
+    path = Path(cache_dir, f"indicatormatrix_{hasher.hexdigest()}.npz")
+
+    if path.exists():
+        logging.info(f"Reading cached indicator matrix from {path}")
+        return sparse.load_npz(path).tocsr()
+
+    matrix = compute()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    sparse.save_npz(tmp, matrix, compressed=True)
+    os.replace(tmp, path)
+    return matrix
+
+
+class BusGeocoder:
+    """
+    Assigns the attributes of several region layers to points in one pass.
+
+    Every layer is indexed once with a shapely STRtree that is reused by all
+    queries. Points are matched to the first shape of a layer containing
+    them and, optionally, to the nearest shape of the layer otherwise.
+
+    Parameters
+    ----------
+    crs : optional
+        CRS to match points and shapes in, use a projected CRS for meaningful
+        nearest shape matches.
+    """
+
+    def __init__(self, crs=4326):
+        self.crs = crs
+        self.layers = {}
+
+    def add_layer(self, name, shapes, columns):
+        """
+        Indexes the shapes of a layer and the columns to assign from it.
+
+        Parameters
+        ----------
+        name : str
+            Name of the layer.
+        shapes : gpd.GeoDataFrame
+            Shapes of the layer.
+        columns : list[str]
+            Columns of ``shapes`` to assign to matched points.
+
+        Returns
+        -------
+        BusGeocoder
+        """
+        import numpy as np
+        import shapely
+
+        if shapes.crs is not None:
+            shapes = shapes.to_crs(self.crs)
+        tree = shapely.STRtree(np.asarray(shapes.geometry.values))
+        self.layers[name] = (tree, shapes[columns].reset_index(drop=True))
+        return self
+
+    def match(self, points, name, nearest=False):
+        """
+        Positions of the matched shapes of layer ``name``, -1 if unmatched.
+
+        Parameters
+        ----------
+        points : np.ndarray
+            Array of shapely points in the CRS of the geocoder.
+        name : str
+            Name of the layer.
+        nearest : bool, optional
+            Match points outside all shapes to the nearest shape.
+
+        Returns
+        -------
+        np.ndarray
+        """
+        import numpy as np
+        import shapely
+
+        tree, _ = self.layers[name]
+        point_idx, shape_idx = tree.query(points, predicate="intersects")
+        # keep the first shape for points within overlapping shapes
+        order = np.lexsort((shape_idx, point_idx))
+        point_idx, first = np.unique(point_idx[order], return_index=True)
+
+        matches = np.full(len(points), -1)
+        matches[point_idx] = shape_idx[order][first]
+
+        if nearest:
+            missing = np.flatnonzero(
+                (matches == -1)
+                & ~shapely.is_missing(points)
+                & ~shapely.is_empty(points),
+            )
+            if len(missing):
+                point_idx, shape_idx = tree.query_nearest(points[missing])
+                matches[missing[point_idx]] = shape_idx
+        return matches
+
+    def assign(self, points, layers=None, nearest=False):
+        """
+        Attributes of all (or the given) layers for each point.
+
+        Parameters
+        ----------
+        points : gpd.GeoSeries
+            Points to geocode.
+        layers : list[str], optional
+            Names of the layers to assign, all layers by default.
+        nearest : bool, optional
+            Match points outside all shapes to the nearest shape.
+
+        Returns
+        -------
+        pd.DataFrame
+            Assigned columns of all layers, indexed like ``points``.
+        """
+        import numpy as np
+
+        if points.crs is not None:
+            points = points.to_crs(self.crs)
+        geoms = np.asarray(points.values)
+        attributes = []
+        for name in layers or self.layers:
+            matches = self.match(geoms, name, nearest=nearest)
+            matched = self.layers[name][1].reindex(matches)
+            matched.index = points.index
+            attributes.append(matched)
+        return pd.concat(attributes, axis=1)
+
+
+def project_xy(x, y, crs=5070):
+    """
+    Projects longitudes and latitudes to planar coordinates (CONUS Albers by
+    default).
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (len(x), 2) with the projected coordinates.
+    """
+    import numpy as np
+    from pyproj import Transformer
+
+    transformer = Transformer.from_crs(4326, crs, always_xy=True)
+    return np.column_stack(transformer.transform(np.asarray(x), np.asarray(y)))
+
+
+def write_demand(demand, path, csv=None):
+    """
+    Writes a (snapshot x bus) demand table as an uncompressed arrow file with
+    float32 values and the snapshots as a native datetime column.
+
+    Parameters
+    ----------
+    demand : pd.DataFrame
+        Demand indexed by snapshot with one column per bus.
+    path : str
+        Path of the arrow file.
+    csv : str, optional
+        Path of an additional csv export of the demand for debugging.
+    """
+    from pyarrow import feather
+
+    data = demand.astype("float32")
+    data.columns = data.columns.astype(str)
+    data = data.rename_axis("snapshot").reset_index()
+    feather.write_feather(data, path, compression="uncompressed")
+    if csv:
+        demand.round(4).to_csv(csv, index=True)
+
+
+def read_demand(path):
+    """
+    Reads a demand table written by ``write_demand``.
+
+    The file is memory-mapped and the values are copied once into a single
+    float32 block, without parsing any text.
+
+    Parameters
+    ----------
+    path : str
+        Path of the arrow file.
+
+    Returns
+    -------
+    pd.DataFrame
+        Demand indexed by snapshot with one float32 column per bus.
+    """
+    from pyarrow import feather
+
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas().set_index("snapshot")
+
+
 def validate_checksum(file_path, zenodo_url=None, checksum=None):
     """
     Validate file checksum against provided or Zenodo-retrieved checksum.
@@ -508,11 +791,7 @@ def validate_checksum(file_path, zenodo_url=None, checksum=None):
     if zenodo_url:
         checksum = get_checksum_from_zenodo(zenodo_url)
     hash_type, checksum = checksum.split(":")
-    hasher = hashlib.new(hash_type)
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(65536), b""):  # 64kb chunks
-            hasher.update(chunk)
-    calculated_checksum = hasher.hexdigest()
+    calculated_checksum = file_checksum(file_path, hash_type)
     assert (
         calculated_checksum == checksum
     ), "Checksum is invalid. This may be due to an incomplete download. Delete the file and re-execute the rule."
@@ -551,6 +830,7 @@ def update_config_from_wildcards(config, w, inplace=True):
     """
     Parses configuration settings from wildcards and updates the config.
     """
+    from snakemake.utils import update_config
 
     if not inplace:
         config = copy.deepcopy(config)
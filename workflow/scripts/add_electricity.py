@@ -26,7 +26,7 @@ Extendable generators are assigned a maximum capacity based on land-use constrai
 **Inputs**
 
 - ``resources/costs.csv``: The database of cost assumptions for all included technologies for specific years from various sources; e.g. discount rate, lifetime, investment (CAPEX), fixed operation and maintenance (FOM), variable operation and maintenance (VOM), fuel costs, efficiency, carbon-dioxide intensity.
-- ``resources/demand.csv`` Hourly per-country load profiles.
+- ``resources/demand_{planning_horizon}.arrow`` Hourly per-bus load profiles of the first planning horizon. The demand files of later planning horizons are built by ``build_demand`` but not yet attached to the network.
 - ``resources/regions_onshore.geojson``: confer :ref:`busregions`
 - ``resources/profile_{}.nc``: all technologies in ``config["renewables"].keys()``, confer :ref:`renewableprofiles`.
 - ``networks/elec_base_network.nc``: confer :ref:`base`
@@ -55,6 +55,7 @@ from _helpers import (
     configure_logging,
     export_network_for_gis_mapping,
     local_to_utc,
+    read_demand,
     test_network_datatype_consistency,
     update_p_nom_max,
 )
@@ -709,8 +710,7 @@ def attach_demand(n: pypsa.Network, demand_per_bus_fn: str):
 
     Returns network with demand added.
     """
-    demand_per_bus = pd.read_csv(demand_per_bus_fn, index_col=0)
-    demand_per_bus.index = pd.to_datetime(demand_per_bus.index)
+    demand_per_bus = read_demand(demand_per_bus_fn)
     n.madd(
         "Load",
         demand_per_bus.columns,
@@ -15,9 +15,9 @@ logger = logging.getLogger(__name__)
 import sys
 
 import constants
-from _helpers import configure_logging
+from _helpers import BusGeocoder, configure_logging
 from build_natural_gas import build_natural_gas
-from shapely.geometry import Point
+from eia import configure_cache
 
 
 def assign_bus_2_state(
@@ -32,21 +32,25 @@ def assign_bus_2_state(
     The shapefile must be the counties shapefile
     """
 
-    buses = n.buses[["x", "y"]].copy()
-    buses["geometry"] = buses.apply(lambda x: Point(x.x, x.y), axis=1)
-    buses = gpd.GeoDataFrame(buses, crs="EPSG:4269")
+    buses = gpd.GeoSeries(
+        gpd.points_from_xy(n.buses.x, n.buses.y),
+        index=n.buses.index,
+        crs="EPSG:4269",
+    )
 
-    states = gpd.read_file(shp).dissolve("STUSPS")["geometry"]
-    states = gpd.GeoDataFrame(states)
+    states = gpd.read_file(shp).dissolve("STUSPS")[["geometry"]]
     if states_2_include:
         states = states[states.index.isin(states_2_include)]
 
-    # project to avoid CRS warning from geopandas
-    buses_projected = buses.to_crs("EPSG:3857")
-    states_projected = states.to_crs("EPSG:3857")
-    gdf = gpd.sjoin_nearest(buses_projected, states_projected, how="left")
+    # project to match buses outside of all states to the nearest one
+    geocoder = BusGeocoder(crs="EPSG:3857").add_layer(
+        "state",
+        states.reset_index(),
+        ["STUSPS"],
+    )
 
-    n.buses["STATE"] = n.buses.index.map(gdf.index_right)
+    states = geocoder.assign(buses, layers=["state"], nearest=True)
+    n.buses["STATE"] = states["STUSPS"]
 
     if state_2_state_name:
         n.buses["STATE_NAME"] = n.buses.STATE.map(state_2_state_name)
@@ -66,6 +70,7 @@ if __name__ == "__main__":
             sector="E-G",
         )
     configure_logging(snakemake)
+    configure_cache(**snakemake.config["api"].get("eia_cache", {}))
 
     n = pypsa.Network(snakemake.input.network)
 
@@ -46,11 +46,17 @@ import geopandas as gpd
 import numpy as np
 import pandas as pd
 import pypsa
-from _helpers import configure_logging, test_network_datatype_consistency
+import shapely
+from _helpers import (
+    BusGeocoder,
+    configure_logging,
+    project_xy,
+    test_network_datatype_consistency,
+)
 from build_shapes import load_na_shapes
 from geopandas.tools import sjoin
-from shapely.geometry import Point, Polygon
-from sklearn.neighbors import BallTree
+from scipy.spatial import cKDTree
+from shapely.geometry import Point
 
 
 def haversine_np(lon1, lat1, lon2, lat2):
@@ -204,25 +210,6 @@ def assign_bus_location(buses: pd.DataFrame, buslocs: pd.DataFrame) -> gpd.GeoDa
     return gpd.GeoDataFrame(gdf_bus, crs=4326)
 
 
-def map_bus_to_region(
-    buses: gpd.GeoDataFrame,
-    shape: gpd.GeoDataFrame,
-    names: str,
-) -> gpd.GeoDataFrame:
-    """
-    Maps a bus to a geographic region.
-
-    Args:
-        buses: gpd.GeoDataFrame,
-        shape: gpd.GeoDataFrame,
-        name: str
-            column name in shape to merge
-    """
-    names.append("geometry")
-    shape_filtered = shape[names]
-    return gpd.sjoin(buses, shape_filtered, how="left").drop(columns=["index_right"])
-
-
 def assign_line_length(n: pypsa.Network):
     """
     Assigns line length to each line in the network using Haversine distance.
@@ -245,40 +232,30 @@ def create_grid(polygon, cell_size):
         cell.
     """
     minx, miny, maxx, maxy = polygon.bounds
-    grid_cells = []
-
-    # Create the grid cells
-    x = minx
-    while x < maxx:
-        y = miny
-        while y < maxy:
-            grid_cells.append(
-                Polygon(
-                    [
-                        (x, y),
-                        (x + cell_size, y),
-                        (x + cell_size, y + cell_size),
-                        (x, y + cell_size),
-                    ],
-                ),
-            )
-            y += cell_size
-        x += cell_size
-
-    # Convert to a GeoDataFrame
-    grid_gdf = gpd.GeoDataFrame(geometry=grid_cells)
-
-    # Filter to only those cells that intersect the polygon
-    intersecting_cells = grid_gdf[grid_gdf.intersects(polygon)]
-
-    # Find the center of each cell
-    centers = intersecting_cells.geometry.centroid
-
-    # Remove centroids that are outside of the polygon
-    centers = [center for center in centers if center.within(polygon)]
+
+    def cell_origins(start, stop):
+        # accumulate like repeated `+= cell_size` to hit the same coordinates
+        steps = int(np.ceil((stop - start) / cell_size)) + 1
+        origins = np.add.accumulate(np.r_[start, np.full(steps, cell_size)])
+        return origins[origins < stop]
+
+    # Find the center of each grid cell, column by column
+    x, y = np.meshgrid(
+        cell_origins(minx, maxx),
+        cell_origins(miny, maxy),
+        indexing="ij",
+    )
+    centers = np.column_stack([x.ravel(), y.ravel()]) + cell_size / 2
+
+    # Keep only centers inside of the polygon, their cells intersect it as well
+    prepared = shapely.is_prepared(polygon)
+    shapely.prepare(polygon)
+    centers = centers[shapely.contains_xy(polygon, centers[:, 0], centers[:, 1])]
+    if not prepared:
+        shapely.destroy_prepared(polygon)
 
     # Return the coordinates of the centers
-    return [(center.y, center.x) for center in centers]
+    return list(zip(centers[:, 1].tolist(), centers[:, 0].tolist()))
 
 
 def build_offshore_buses(
@@ -352,26 +329,15 @@ def identify_osw_poi(n: pypsa.Network) -> pypsa.Network:
 def match_missing_buses(buses_to_match_to, missing_buses):
     "Match buses missing region assignment to their nearest bus"
     missing_buses = missing_buses.copy()
-    missing_buses["bus_assignment"] = None
-
-    buses_to_match_to["geometry"] = gpd.points_from_xy(
-        buses_to_match_to["x"],
-        buses_to_match_to["y"],
-    )
 
-    # from: https://stackoverflow.com/questions/58893719/find-nearest-point-in-other-dataframe-with-a-lot-of-data
-    # Create a BallTree
-    tree = BallTree(buses_to_match_to[["x", "y"]].values, leaf_size=2)
-    # Query the BallTree on each feature from 'appart' to find the distance
-    # to the nearest 'pharma' and its id
-    missing_buses["distance_nearest"], missing_buses["id_nearest"] = tree.query(
-        missing_buses[["x", "y"]].values,  # The input array for the query
-        k=1,  # The number of nearest neighbors
-    )
-    missing_buses["bus_assignment"] = (
-        buses_to_match_to.reset_index().iloc[missing_buses.id_nearest].Bus.values
+    # query all missing buses at once on a KD-tree of projected coordinates
+    tree = cKDTree(project_xy(buses_to_match_to["x"], buses_to_match_to["y"]))
+    distance, id_nearest = tree.query(
+        project_xy(missing_buses["x"], missing_buses["y"]),
+        k=1,
     )
-    missing_buses.drop(columns=["id_nearest"], inplace=True)
+    missing_buses["distance_nearest"] = distance  # in m
+    missing_buses["bus_assignment"] = buses_to_match_to.index[id_nearest].values
     return missing_buses
 
 
@@ -683,12 +649,15 @@ def main(snakemake):
     )
 
     # assign ba, state, and country to each bus
-    gdf_bus = map_bus_to_region(gdf_bus, na_shape, ["full_state"])  # for laf
-    gdf_bus = map_bus_to_region(gdf_bus, ba_shape, ["balancing_area"])
-    gdf_bus = map_bus_to_region(gdf_bus, state_shape, ["state"])
-    gdf_bus = map_bus_to_region(gdf_bus, state_shape, ["country"])
-    gdf_bus = map_bus_to_region(gdf_bus, reeds_shape, ["reeds_zone", "reeds_ba"])
-    gdf_bus = map_bus_to_region(gdf_bus, county_shape, ["county"])
+    geocoder = (
+        BusGeocoder(crs=gdf_bus.crs)
+        .add_layer("full_state", na_shape, ["full_state"])  # for laf
+        .add_layer("balancing_area", ba_shape, ["balancing_area"])
+        .add_layer("state", state_shape, ["state", "country"])
+        .add_layer("reeds_zone", reeds_shape, ["reeds_zone", "reeds_ba"])
+        .add_layer("county", county_shape, ["county"])
+    )
+    gdf_bus = gdf_bus.join(geocoder.assign(gdf_bus.geometry))
 
     # assign load allocation factors to buses for state level dissagregation
     gdf_bus = assign_missing_state_regions(gdf_bus)
@@ -25,15 +25,16 @@ Creates Voronoi shapes for each bus representing both onshore and offshore regio
 
 
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from functools import reduce
 
 import geopandas as gpd
 import numpy as np
 import pandas as pd
 import pypsa
+import shapely
 from _helpers import REGION_COLS, configure_logging
 from scipy.spatial import Voronoi
-from shapely.geometry import Polygon
 
 
 def voronoi_partition_pts(points, outline):
@@ -76,20 +77,42 @@ def voronoi_partition_pts(points, outline):
             ),
         )
 
-        polygons = []
-        for i in range(len(points)):
-            poly = Polygon(vor.vertices[vor.regions[vor.point_region[i]]])
-
-            if not poly.is_valid:
-                poly = poly.buffer(0)
+        polygons = np.array(
+            [
+                shapely.polygons(vor.vertices[vor.regions[vor.point_region[i]]])
+                for i in range(len(points))
+            ],
+            dtype=object,
+        )
 
-            poly = poly.intersection(outline)
+        invalid = ~shapely.is_valid(polygons)
+        polygons[invalid] = shapely.buffer(polygons[invalid], 0)
 
-            polygons.append(poly)
+        polygons = shapely.intersection(polygons, outline)
 
     return np.array(polygons, dtype=object)
 
 
+def partition_regions(points, outlines, workers=1):
+    """
+    Compute the voronoi partitions of each set of `points` within the
+    corresponding `outline`, spread over a pool of `workers` processes.
+
+    Attributes
+    ----------
+    points : list of Nx2 - ndarray[dtype=float]
+    outlines : list of Polygon
+    workers : int
+    Returns
+    -------
+    partitions : list of N - ndarray[dtype=Polygon|MultiPolygon]
+    """
+    if workers > 1 and len(outlines) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(outlines))) as executor:
+            return list(executor.map(voronoi_partition_pts, points, outlines))
+    return [voronoi_partition_pts(p, o) for p, o in zip(points, outlines)]
+
+
 def main(snakemake):
     # Configurations
     countries = snakemake.config["countries"]
@@ -150,7 +173,10 @@ def main(snakemake):
     bus2sub_onshore = bus2sub[bus2sub.Bus.isin(onshore_buses.index)]
     bus2sub_offshore = bus2sub[~bus2sub.Bus.isin(onshore_buses.index)]
 
+    workers = int(snakemake.threads)
+
     logger.info("Building Onshore Regions")
+    onshore_zones = []
     for region in agg_region_shapes.index:
         region_shape = agg_region_shapes[region]  # current shape
         region_subs = bus2sub_onshore[f"{aggregation_zones}"][
@@ -167,13 +193,21 @@ def main(snakemake):
                 gpd.GeoDataFrame(geometry=region_shape).dissolve().iloc[0].geometry
             )
 
+        onshore_zones.append((region, region_locs, region_shape))
+
+    partitions = partition_regions(
+        [region_locs.values for _, region_locs, _ in onshore_zones],
+        [region_shape for _, _, region_shape in onshore_zones],
+        workers,
+    )
+    for (region, region_locs, _), geometry in zip(onshore_zones, partitions):
         onshore_regions.append(
             gpd.GeoDataFrame(
                 {
                     "name": region_locs.index,
                     "x": region_locs["x"],
                     "y": region_locs["y"],
-                    "geometry": voronoi_partition_pts(region_locs.values, region_shape),
+                    "geometry": geometry,
                     "country": region,
                 },
             ),
@@ -181,21 +215,22 @@ def main(snakemake):
 
     ### Defining Offshore Regions ###
     logger.info("Building Offshore Regions")
-    for i in range(len(offshore_shapes)):
-        offshore_shape = offshore_shapes.iloc[i]
-        shape_name = offshore_shapes.index[i]
-        offshore_buses = bus2sub_offshore[["x", "y"]]
-        if offshore_buses.empty:
-            continue
+    offshore_buses = bus2sub_offshore[["x", "y"]]
+    if offshore_buses.empty:
+        offshore_partitions = []
+    else:
+        offshore_partitions = partition_regions(
+            [offshore_buses.values] * len(offshore_shapes),
+            list(offshore_shapes),
+            workers,
+        )
+    for shape_name, geometry in zip(offshore_shapes.index, offshore_partitions):
         offshore_regions_c = gpd.GeoDataFrame(
             {
                 "name": offshore_buses.index,
                 "x": offshore_buses["x"],
                 "y": offshore_buses["y"],
-                "geometry": voronoi_partition_pts(
-                    offshore_buses.values,
-                    offshore_shape,
-                ),
+                "geometry": geometry,
                 "country": shape_name,
             },
         )
@@ -7,6 +7,7 @@ import atlite
 import geopandas as gpd
 import pandas as pd
 import xarray as xr
+from _helpers import cached_indicatormatrix
 
 if __name__ == "__main__":
     if "snakemake" not in globals():
@@ -28,7 +29,12 @@ if __name__ == "__main__":
         .squeeze()
     )
 
-    I = cutout.indicatormatrix(clustered_regions)
+    I = cached_indicatormatrix(
+        cutout.grid.geometry,
+        clustered_regions,
+        snakemake.config["atlite"].get("cache_dir"),
+        orig_crs=cutout.crs,
+    )
 
     pop = {}
     for item in ["total", "urban", "rural"]:
@@ -12,10 +12,18 @@ COP ASHP = 6.81 - 0.121(Tsink - Tsource) + 0.000630(Tsink - Tsource)^2 for 15 <=
 COP GSHP = 8.77 - 0.150(Tsink - Tsource) + 0.000734(Tsink - Tsource)^2 for 20 <= DT <= 60
 
 A Tsink of 50-60C is recommended for how water temperatures
+
+All six source temperature profiles are opened lazily as chunked arrays and
+the COPs of all areas and sources are written in a single dask computation as
+compressed float32, so only a few chunks are held in memory at a time.
 """
 
+import dask
 import xarray as xr
 
+AREAS = ["total", "urban", "rural"]
+SOURCES = ["air", "soil"]
+
 
 def coefficient_of_performance(
     delta_T: xr.DataArray,
@@ -29,6 +37,43 @@ def coefficient_of_performance(
         raise NotImplementedError("'source' must be one of  ['air', 'soil']")
 
 
+def write_cop_profiles(
+    inputs,
+    outputs,
+    sink_T: float,
+    chunks="auto",
+    complevel: int = 4,
+):
+    """
+    Calculates the COP profiles of all areas and sources as one lazily
+    evaluated graph and writes them in a single scheduled pass.
+
+    ``inputs`` and ``outputs`` map ``temp_{source}_{area}`` and
+    ``cop_{source}_{area}`` to file paths.
+    """
+    encoding = {"cop": {"dtype": "float32", "zlib": True, "complevel": complevel}}
+    writes = []
+    for area in AREAS:
+        for source in SOURCES:
+            source_T = xr.open_dataarray(
+                inputs[f"temp_{source}_{area}"],
+                chunks=chunks,
+            )
+
+            delta_T = sink_T - source_T
+
+            cop = coefficient_of_performance(delta_T, source).rename("cop")
+
+            writes.append(
+                cop.to_netcdf(
+                    outputs[f"cop_{source}_{area}"],
+                    encoding=encoding,
+                    compute=False,
+                ),
+            )
+    dask.compute(*writes)
+
+
 if __name__ == "__main__":
     if "snakemake" not in globals():
         from _helpers import mock_snakemake
@@ -39,12 +84,8 @@ if __name__ == "__main__":
             clusters=60,
         )
 
-    for area in ["total", "urban", "rural"]:
-        for source in ["air", "soil"]:
-            source_T = xr.open_dataarray(snakemake.input[f"temp_{source}_{area}"])
-
-            delta_T = snakemake.params.heat_pump_sink_T - source_T
-
-            cop = coefficient_of_performance(delta_T, source)
-
-            cop.to_netcdf(snakemake.output[f"cop_{source}_{area}"])
+    write_cop_profiles(
+        snakemake.input,
+        snakemake.output,
+        snakemake.params.heat_pump_sink_T,
+    )
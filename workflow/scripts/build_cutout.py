@@ -16,8 +16,11 @@ For this rule to work you must have
 
     atlite:
         nprocesses:
+        national_cutout:
         cutouts:
             {cutout}:
+        interconnects:
+            {interconnect}:
 
 .. seealso::
     Documentation of the configuration file ``config/config.yaml`` at
@@ -25,7 +28,7 @@ For this rule to work you must have
 
 **Inputs**
 
-None
+- ``cutouts/{national_cutout}_{cutout}.nc``: (only if ``atlite: national_cutout:`` is set and differs from ``{interconnect}``)
 
 **Outputs**
 
@@ -79,6 +82,12 @@ Using the ERA5 cutout, the following parameters are accessible:
                                                  (Jm**-2). Takes values between 0 and 1.
     ===================  ==========  ==========  =========================================================
 
+If ``atlite: national_cutout:`` names an interconnect (e.g. ``usa``), only the
+cutout of that interconnect is prepared from the weather data. The cutouts of
+all other interconnects are cut out of it on the same grid, which avoids
+downloading and preparing overlapping areas repeatedly. The sliced cutouts are
+regular atlite cutouts, so that rules using them are unaffected.
+
 The **USA Interconnect** weather data is shown below:
 
     .. image:: _static/cutouts/weather.png
@@ -89,11 +98,54 @@ import logging
 
 import atlite
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 from _helpers import configure_logging
 
 logger = logging.getLogger(__name__)
 
+
+def slice_cutout(national_path, path, x, y, dx=None, dy=None, compression=None):
+    """
+    Writes the part of the national cutout within the ``x`` and ``y`` slices
+    as a cutout to ``path``.
+
+    The national grid is reused as is, so the requested resolution ``dx`` and
+    ``dy`` has to match it, and the slices have to lie within its extent.
+    The data is copied chunk by chunk without recomputing any feature.
+    """
+    national = atlite.Cutout(national_path)
+    for requested, actual in ((dx, national.dx), (dy, national.dy)):
+        if requested is not None and not np.isclose(requested, actual):
+            raise ValueError(
+                f"Resolution {requested} differs from the resolution {actual} of "
+                f"the national cutout {national_path}, set `national_cutout` to "
+                "empty to prepare the cutout separately.",
+            )
+
+    # a slice beyond the national cutout would silently return a clipped cutout
+    xmin, xmax, ymin, ymax = national.extent
+    for name, requested, lower, upper in (("x", x, xmin, xmax), ("y", y, ymin, ymax)):
+        bounds = [b for b in (requested.start, requested.stop) if b is not None]
+        if any(b < lower or b > upper for b in bounds):
+            raise ValueError(
+                f"Requested {name} range {requested.start} to {requested.stop} "
+                f"exceeds the extent {lower} to {upper} of the national cutout "
+                f"{national_path}, extend the national cutout or set "
+                "`national_cutout` to empty to prepare the cutout separately.",
+            )
+
+    data = national.data.sel(x=x, y=y)
+    if compression is None:
+        compression = {"zlib": True, "complevel": 9}
+    encoding = {var: compression for var in data.data_vars}
+    logger.info(
+        f"Slicing cutout with x={x}, y={y} from {national_path} "
+        f"({data.sizes['x']} x {data.sizes['y']} cells).",
+    )
+    data.to_netcdf(path, encoding=encoding)
+
+
 if __name__ == "__main__":
     if "snakemake" not in globals():
         from _helpers import mock_snakemake
@@ -135,7 +187,22 @@ if __name__ == "__main__":
 
     cutout_params.update(interconnect_params)
 
-    logging.info(f"Preparing cutout with parameters {cutout_params}.")
-    features = cutout_params.pop("features", None)
-    cutout = atlite.Cutout(snakemake.output[0], **cutout_params)
-    cutout.prepare(features=features)
+    if snakemake.input.get("national"):
+        if "bounds" in cutout_params:
+            x0, y0, x1, y1 = cutout_params["bounds"]
+            x, y = slice(x0, x1), slice(y0, y1)
+        else:
+            x, y = cutout_params["x"], cutout_params["y"]
+        slice_cutout(
+            snakemake.input.national,
+            snakemake.output[0],
+            x,
+            y,
+            dx=cutout_params.get("dx"),
+            dy=cutout_params.get("dy"),
+        )
+    else:
+        logging.info(f"Preparing cutout with parameters {cutout_params}.")
+        features = cutout_params.pop("features", None)
+        cutout = atlite.Cutout(snakemake.output[0], **cutout_params)
+        cutout.prepare(features=features)
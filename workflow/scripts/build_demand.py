@@ -21,17 +21,26 @@ Builds the demand data for the PyPSA network.
 
     - base_network:
     - eia: (GridEmissions data file)
-    - efs: (NREL EFS Load Forecasts)
+    - efs: (NREL EFS Load Forecasts, partitioned by build_efs_dataset)
 
 **Outputs**
 
-    - demand: Path to the demand CSV file.
+    - demand_{planning_horizon}: Path to the float32 arrow demand file of each planning horizon.
+    - demand_csv_{planning_horizon}: Optional CSV export of the demand for debugging.
+
+Historical EIA profiles are scaled to each planning horizon by
+``electricity: demand: scale``, either by a constant factor or by the AEO
+growth of total end-use energy (``aeo``). ``add_electricity`` only attaches
+the demand of the first planning horizon, the files of later horizons are
+not consumed by the workflow yet.
 """
 
 # snakemake is not liking this futures import. Removing type hints in context class
 # from __future__ import annotations
 
+import hashlib
 import logging
+import os
 import sys
 from abc import ABC, abstractmethod
 from itertools import product
@@ -39,11 +48,14 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 import constants as const
+import numpy as np
 import pandas as pd
 import pypsa
 import xarray as xr
-from _helpers import configure_logging
-from eia import EnergyDemand
+from _helpers import configure_logging, write_demand
+from eia import EnergyDemand, configure_cache, get_batch_data
+from pyarrow import feather
+from scipy import sparse
 
 logger = logging.getLogger(__name__)
 
@@ -111,6 +123,23 @@ class Context:
         demand = self._read()
         return self._write(demand, self._read_strategy.zone, **kwargs)
 
+    def prepare_horizon_demands(
+        self,
+        sns: dict[int, pd.DatetimeIndex],
+        **kwargs,
+    ) -> dict[int, pd.DataFrame]:
+        """
+        Read in demand once and dissagregate it for each planning horizon.
+
+        sns maps each planning horizon to the snapshots to extract for it.
+        """
+        demand = self._read()
+        zone = self._read_strategy.zone
+        return {
+            horizon: self._write(demand, zone, sns=snapshots, **kwargs)
+            for horizon, snapshots in sns.items()
+        }
+
 
 ###
 # READ STRATEGIES
@@ -123,8 +152,15 @@ class ReadStrategy(ABC):
     of some algorithm.
     """
 
-    def __init__(self, filepath: str | None = None) -> None:
+    INDEX = ["snapshot", "sector", "subsector", "fuel"]
+
+    def __init__(
+        self,
+        filepath: str | None = None,
+        cache_dir: str | None = None,
+    ) -> None:
         self.filepath = filepath
+        self.cache_dir = cache_dir
 
     @property
     def units():
@@ -140,13 +176,62 @@ class ReadStrategy(ABC):
     def read_demand(self) -> pd.DataFrame:
         """
         Public interface to extract data.
+
+        If a cache directory is given, the formatted data is stored there as
+        an uncompressed arrow file keyed by the source file and reader.
+        Subsequent reads load that file instead of parsing and formatting the
+        source again, the values are copied once into the returned frame.
         """
 
+        cache = self._cache_path()
+        if cache is not None and cache.exists():
+            logger.info(f"Reading formatted demand from {cache}")
+            table = feather.read_table(cache, memory_map=True)
+            return table.to_pandas().set_index(self.INDEX)
+
         df = self._read_data()
         df = self._format_data(df)
         self._check_index(df)
+
+        if cache is not None:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+            data = df.reset_index()
+            data.columns = data.columns.astype(str)
+            feather.write_feather(data, tmp, compression="uncompressed")
+            os.replace(tmp, cache)
         return df
 
+    def _cache_key(self) -> list[str]:
+        """
+        Reader options, besides the source file, the formatted data depends on.
+        """
+        return []
+
+    def _source_fingerprint(self) -> str:
+        """
+        Identifies the source by path, size and modification time of its files
+        rather than hashing its content.
+        """
+        source = Path(self.filepath).resolve()
+        files = sorted(source.rglob("*")) if source.is_dir() else [source]
+        stats = [
+            f"{f.relative_to(source.parent)}:{f.stat().st_size}:{f.stat().st_mtime_ns}"
+            for f in files
+            if f.is_file()
+        ]
+        return ",".join([str(source), *stats])
+
+    def _cache_path(self) -> Path | None:
+        """
+        Returns the cache file of the formatted data.
+        """
+        if not (self.cache_dir and self.filepath):
+            return None
+        key = [self._source_fingerprint(), type(self).__name__, *self._cache_key()]
+        digest = hashlib.sha256("|".join(key).encode()).hexdigest()
+        return Path(self.cache_dir, f"{type(self).__name__}_{digest[:16]}.arrow")
+
     @abstractmethod
     def _format_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -216,8 +301,12 @@ class ReadEia(ReadStrategy):
     Reads data from GridEmissions.
     """
 
-    def __init__(self, filepath: str | None = None) -> None:
-        super().__init__(filepath)
+    def __init__(
+        self,
+        filepath: str | None = None,
+        cache_dir: str | None = None,
+    ) -> None:
+        super().__init__(filepath, cache_dir)
         self._zone = "ba"
 
     @property
@@ -280,16 +369,36 @@ class ReadEia(ReadStrategy):
 class ReadEfs(ReadStrategy):
     """
     Reads in electrifications future study demand.
+
+    Reads the parquet dataset of the EFS csv partitioned by year, state and
+    sector by the rule build_efs_dataset. Only the partitions of the
+    requested years and states (state codes) and the used columns are read.
     """
 
-    def __init__(self, filepath: str | None = None) -> None:
-        super().__init__(filepath)
+    COLUMNS = ["Year", "LocalHourID", "State", "Sector", "Subsector", "LoadMW"]
+
+    def __init__(
+        self,
+        filepath: str | None = None,
+        years: list[int] | None = None,
+        states: list[str] | None = None,
+        cache_dir: str | None = None,
+    ) -> None:
+        super().__init__(filepath, cache_dir)
         self._zone = "state"
+        self.years = years
+        self.states = states
 
     @property
     def zone(self):
         return self._zone
 
+    def _cache_key(self) -> list[str]:
+        return [
+            ",".join(map(str, sorted(self.years or []))),
+            ",".join(sorted(self.states or [])),
+        ]
+
     def _read_data(self) -> pd.DataFrame:
 
         if not self.filepath:
@@ -297,7 +406,21 @@ class ReadEfs(ReadStrategy):
             sys.exit()
 
         logger.info("Building Load Data using EFS demand")
-        return pd.read_csv(self.filepath, engine="pyarrow")
+        filters = []
+        if self.years:
+            filters.append(("Year", "in", list(self.years)))
+        if self.states:
+            filters.append(("State", "in", list(self.states)))
+        df = pd.read_parquet(
+            self.filepath,
+            columns=self.COLUMNS,
+            filters=filters or None,
+        )
+        # partition columns are read back as categoricals
+        df["Year"] = df.Year.astype(int)
+        df["State"] = df.State.astype(str)
+        df["Sector"] = df.Sector.astype(str)
+        return df
 
     def _format_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -369,7 +492,7 @@ class ReadEfs(ReadStrategy):
 
         df["utc_shift"] = df.State.map(utc_shift)
         df["UtcHourID"] = df.LocalHourID + df.utc_shift
-        df["UtcHourID"] = df.UtcHourID.map(lambda x: x if x < 8761 else x - 8760)
+        df["UtcHourID"] = df.UtcHourID.where(df.UtcHourID < 8761, df.UtcHourID - 8760)
         df = df.drop(columns=["utc_shift"])
         return df
 
@@ -435,6 +558,7 @@ class WriteStrategy(ABC):
 
     def __init__(self, n: pypsa.Network) -> None:
         self.n = n
+        self._disaggregations = {}
 
     @abstractmethod
     def _get_load_allocation_factor(
@@ -498,6 +622,19 @@ class WriteStrategy(ABC):
         demand = self._filter_demand(df, sector, subsector, fuel, sns)
         demand = self._group_demand(demand)
 
+        # disaggregate load to buses
+        return self._disaggregate_demand_to_buses(demand, zone)
+
+    def _get_disaggregation(self, zone: str) -> tuple:
+        """
+        Builds the (zones x buses) load allocation matrix of a zone type.
+
+        The matrix only depends on the network, so it is built once per zone
+        type and reused for every demand that is dissagregated.
+        """
+        if zone in self._disaggregations:
+            return self._disaggregations[zone]
+
         # assign buses to dissagregation zone
         dissagregation_zones = self._get_load_dissagregation_zones(zone)
 
@@ -507,11 +644,26 @@ class WriteStrategy(ABC):
         # checks that sum of all LAFs is equal to the number of zones.
         # assert abs(laf.sum() - len(dissagregation_zones.unique())) <= 0.0001
 
-        # disaggregate load to buses
-        zone_data = dissagregation_zones.to_frame(name="zone").join(
+        laf = dissagregation_zones.to_frame(name="zone").join(
             laf.to_frame(name="laf"),
         )
-        return self._disaggregate_demand_to_buses(demand, zone_data)
+        zones = laf.zone.unique()
+
+        # buses sorted by name and grouped by zone, in order of the zones
+        zone_idx = pd.Index(zones).get_indexer(laf.zone)
+        order = laf.index.argsort()
+        order = order[zone_idx[order].argsort(kind="stable")]
+        buses = laf.index[order]
+
+        # ensure no data is lost
+        assert not laf.laf.isna().any()
+
+        matrix = sparse.csr_matrix(
+            (laf.laf.values[order], (zone_idx[order], np.arange(len(buses)))),
+            shape=(len(zones), len(buses)),
+        )
+        self._disaggregations[zone] = (zones, buses, matrix)
+        return self._disaggregations[zone]
 
     def _get_load_dissagregation_zones(self, zone: str) -> pd.Series:
         """
@@ -612,28 +764,28 @@ class WriteStrategy(ABC):
     def _disaggregate_demand_to_buses(
         self,
         demand: pd.DataFrame,
-        laf: pd.DataFrame,
+        zone: str,
     ) -> pd.DataFrame:
         """
         Zone power demand is disaggregated to buses proportional to laf.
+
+        The LAFs form a sparse (zones x buses) matrix with one entry per bus,
+        so all buses are disaggregated with a single matrix product.
         """
 
-        all_load = []
+        zones, buses, matrix = self._get_disaggregation(zone)
 
-        for load_zone in laf.zone.unique():
-            load = laf[laf.zone == load_zone]
-            load_per_bus = pd.DataFrame(
-                data=([demand[load_zone]] * len(load.index)),
-                index=load.index,
-            )
-            dissag_load = load_per_bus.mul(laf.laf, axis=0).dropna()
-            assert dissag_load.shape == load_per_bus.shape  # ensure no data is lost
-            dissag_load = dissag_load.T  # set snapshot as index
-            dissag_load = dissag_load.loc[:, (dissag_load != 0).any(axis=0)]
-            all_load.append(dissag_load)
-
-        load = pd.concat(all_load, axis=1)
-        assert not load.isna().any().any()  # no data should be added during concat
+        zone_demand = demand[zones]  # raises on zones without demand
+        # ensure no data is lost
+        assert not zone_demand.isna().any().any()
+
+        load = pd.DataFrame(
+            zone_demand.values @ matrix,
+            index=demand.index,
+            columns=buses,
+        )
+        load = load.loc[:, (load != 0).any(axis=0)]
+        assert not load.isna().any().any()  # no data should be added
         return load
 
     def _get_balanceing_area_zones(self) -> pd.Series:
@@ -710,30 +862,6 @@ def get_aeo_growth_rate(
     | 2050 |     ###     |     ###     |     ###     |     ###    |  ###  |
     """
 
-    def get_historical_value(api: str, year: int, sector: str) -> float:
-        """
-        Returns single year value at a time.
-        """
-        energy = EnergyDemand(sector=sector, year=year, api=api).get_data()
-        return energy.value.div(1000).sum()  # trillion btu -> quads
-
-    def get_future_values(
-        api: str,
-        year: int,
-        sector: str,
-        scenario: str,
-    ) -> pd.DataFrame:
-        """
-        Returns all values from 2024 onwards.
-        """
-        energy = EnergyDemand(
-            sector=sector,
-            year=year,
-            api=api,
-            scenario=scenario,
-        ).get_data()
-        return energy
-
     assert min(years) > 2017
     assert max(years) < 2051
 
@@ -744,13 +872,24 @@ def get_aeo_growth_rate(
         index=years,
     )
 
-    for year in sorted(years):
-        if year < 2024:
-            for sector in sectors:
-                df.at[year, sector] = get_historical_value(api, year, sector)
-
-    for sector in sectors:
-        aeo = get_future_values(api, max(years), sector, aeo_scenario)
+    # historical values are requested per year, future values all from 2024
+    # onwards with a single request per sector
+    historical = [
+        (year, sector) for year in sorted(years) if year < 2024 for sector in sectors
+    ]
+    future = sectors if max(years) >= 2024 else ()
+    products = [
+        EnergyDemand(sector=sector, year=year, api=api) for year, sector in historical
+    ] + [
+        EnergyDemand(sector=sector, year=max(years), api=api, scenario=aeo_scenario)
+        for sector in future
+    ]
+    energies = get_batch_data(products)
+
+    for (year, sector), energy in zip(historical, energies):
+        df.at[year, sector] = energy.value.div(1000).sum()  # trillion btu -> quads
+
+    for sector, aeo in zip(future, energies[len(historical) :]):
         for year in years:
             if year < 2024:
                 continue
@@ -770,6 +909,7 @@ if __name__ == "__main__":
 
         snakemake = mock_snakemake("build_demand", interconnect="western")
     configure_logging(snakemake)
+    configure_cache(**snakemake.config["api"].get("eia_cache", {}))
 
     n = pypsa.Network(snakemake.input.base_network)
 
@@ -791,6 +931,7 @@ if __name__ == "__main__":
     demand_profile = demand_params.get("profile", "eia")
     demand_scale = demand_params.get("scale", 1)
     demand_disaggregation = demand_params.get("disaggregation", "pop")
+    demand_cache = demand_params.get("cache_dir")
     eia_api = snakemake.params.eia_api
 
     if demand_scale == "aeo":
@@ -798,21 +939,33 @@ if __name__ == "__main__":
 
     profile_year = pd.to_datetime(snapshot_config["start"]).year
     planning_horizons = snakemake.params.planning_horizons
-    assert len(planning_horizons) == 1  # remove for myopic/rolling horizon
-    planning_year = planning_horizons[0]
 
     # set reading and writitng strategies
 
     if demand_profile == "efs":
-        assert planning_year in (2018, 2020, 2024, 2030, 2040, 2050)
-        reader = ReadEfs(snakemake.input.efs)
-        sns = n.snapshots.map(lambda x: x.replace(year=planning_year))
-        profile_year = planning_year  # do not scale EFS data
+        assert all(
+            year in (2018, 2020, 2024, 2030, 2040, 2050) for year in planning_horizons
+        )
+        states = n.buses.state.map(STATE_2_CODE).dropna().unique().tolist()
+        reader = ReadEfs(
+            snakemake.input.efs,
+            years=planning_horizons,
+            states=states,
+            cache_dir=demand_cache,
+        )
+        # one slice of the EFS data per planning horizon
+        sns = {
+            year: n.snapshots.map(lambda x, year=year: x.replace(year=year))
+            for year in planning_horizons
+        }
+        profile_years = {year: year for year in planning_horizons}  # do not scale EFS
 
     elif demand_profile == "eia":
         assert profile_year in range(2018, 2023, 1)
-        reader = ReadEia(snakemake.input.eia[0])
-        sns = n.snapshots
+        reader = ReadEia(snakemake.input.eia[0], cache_dir=demand_cache)
+        # the same historical profile is scaled to each planning horizon
+        sns = {profile_year: n.snapshots}
+        profile_years = {year: profile_year for year in planning_horizons}
 
     else:
         raise NotImplementedError
@@ -825,22 +978,43 @@ if __name__ == "__main__":
 
     demand_converter = Context(reader, writer)
 
-    # extract demand based on strategies
+    # extract demand based on strategies, the source is read and the load
+    # allocation is built only once for all planning horizons
 
-    # optional arguments of 'fuel', 'sector', 'subsector', 'sns'
-    demand = demand_converter.prepare_demand(sns=sns)
+    # optional arguments of 'fuel', 'sector', 'subsector'
+    demands = demand_converter.prepare_horizon_demands(sns=sns)
 
     # scale demand based on planning year and user input
 
-    if profile_year == planning_year:
-        pass
-    elif isinstance(demand_scale, (int, float)):
-        demand *= demand_scale
-    elif demand_scale == "efs":
+    if demand_scale == "aeo" and any(
+        profile_years[year] != year for year in planning_horizons
+    ):
+        aeo_scenario = demand_params.get("scenario", {}).get("aeo", "reference")
+        growth_rate = get_aeo_growth_rate(
+            eia_api,
+            sorted({profile_year, *planning_horizons}),
+            aeo_scenario,
+        )
+        growth_rate = growth_rate.drop(columns="units").astype(float).sum(axis=1)
+    elif demand_scale == "efs" and any(
+        profile_years[year] != year for year in planning_horizons
+    ):
         growth_rate = ReadEfs(snakemake.input.efs).get_growth_rate()
         logger.warning("No scale appied for efs data")
-    elif demand_scale == "aeo":
-        growth_rate = get_aeo_growth_rate(eia_api, [profile_year, planning_year])
-        logger.warning("No scale appied for aeo data")
 
-    demand.round(4).to_csv(snakemake.output.demand, index=True)
+    for planning_year in planning_horizons:
+        demand = demands[profile_years[planning_year]]
+        if profile_years[planning_year] == planning_year:
+            pass
+        elif isinstance(demand_scale, (int, float)):
+            demand = demand * demand_scale
+        elif demand_scale == "aeo":
+            scale = growth_rate[planning_year] / growth_rate[profile_year]
+            logger.info(f"Scaling {profile_year} demand to {planning_year} by {scale}")
+            demand = demand * scale
+
+        write_demand(
+            demand,
+            snakemake.output[f"demand_{planning_year}"],
+            csv=snakemake.output.get(f"demand_csv_{planning_year}"),
+        )
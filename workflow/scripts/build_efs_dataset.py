@@ -0,0 +1,35 @@
+"""
+Converts the NREL EFS load profiles into a partitioned parquet dataset.
+
+The dataset is partitioned by year, state and sector, so that ``build_demand``
+only reads the partitions of the planning years and states of an interconnect.
+
+**Inputs**
+
+    - efs: (NREL EFS Load Forecasts)
+
+**Outputs**
+
+    - efs_dataset: Directory of the partitioned parquet dataset.
+"""
+
+import logging
+
+import pandas as pd
+from _helpers import configure_logging
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["Year", "LocalHourID", "State", "Sector", "Subsector", "LoadMW"]
+PARTITIONS = ["Year", "State", "Sector"]
+
+if __name__ == "__main__":
+    if "snakemake" not in globals():
+        from _helpers import mock_snakemake
+
+        snakemake = mock_snakemake("build_efs_dataset")
+    configure_logging(snakemake)
+
+    logger.info(f"Partitioning EFS data into {snakemake.output.efs_dataset}")
+    df = pd.read_csv(snakemake.input.efs, engine="pyarrow", usecols=COLUMNS)
+    df.to_parquet(snakemake.output.efs_dataset, partition_cols=PARTITIONS, index=False)
@@ -151,6 +151,7 @@ if __name__ == "__main__":
 
         snakemake = mock_snakemake("build_fuel_prices", interconnect="western")
     configure_logging(snakemake)
+    eia.configure_cache(**snakemake.config["api"].get("eia_cache", {}))
 
     snapshot_config = snakemake.config["snapshots"]
     sns_start = pd.to_datetime(snapshot_config["start"])
@@ -281,11 +281,14 @@ class GasStorage(GasData):
         super().__init__(year, interconnect)
 
     def read_data(self):
-        base = eia.Storage("gas", "base", self.year, self.api).get_data()
+        base, total, working = eia.get_batch_data(
+            [
+                eia.Storage("gas", storage, self.year, self.api)
+                for storage in ("base", "total", "working")
+            ],
+        )
         base["storage_type"] = "base_capacity"
-        total = eia.Storage("gas", "total", self.year, self.api).get_data()
         total["storage_type"] = "total_capacity"
-        working = eia.Storage("gas", "working", self.year, self.api).get_data()
         working["storage_type"] = "working_capacity"
 
         final = pd.concat([base, total, working])
@@ -978,8 +981,12 @@ class ImportExportLimits(GasData):
         super().__init__(year, interconnect)
 
     def read_data(self) -> pd.DataFrame:
-        imports = eia.Trade("gas", "imports", self.year, self.api).get_data()
-        exports = eia.Trade("gas", "exports", self.year, self.api).get_data()
+        imports, exports = eia.get_batch_data(
+            [
+                eia.Trade("gas", "imports", self.year, self.api),
+                eia.Trade("gas", "exports", self.year, self.api),
+            ],
+        )
         return pd.concat([imports, exports])
 
     def format_data(self, data: pd.DataFrame) -> pd.DataFrame:
@@ -1086,6 +1093,18 @@ def build_natural_gas(
 
     n.add("Carrier", "gas", color="#d35050", nice_name="Natural Gas")
 
+    # retrieve the EIA data of all components below concurrently, the later
+    # requests of the components are served from the responses of this batch
+
+    eia.get_batch_data(
+        [
+            eia.Production("gas", "market", year, api),
+            *[eia.Storage("gas", x, year, api) for x in ("base", "total", "working")],
+            eia.FuelCosts("gas", "exports", year, api),
+            eia.FuelCosts("gas", "imports", year, api),
+        ],
+    )
+
     # add state level gas buses
 
     buses = GasBuses(interconnect, county_path)
@@ -53,7 +53,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import xarray as xr
-from _helpers import configure_logging, mock_snakemake
+from _helpers import cached_indicatormatrix, configure_logging, mock_snakemake
 
 
 def load_urban_ratio(df: pd.DataFrame) -> pd.DataFrame:
@@ -214,7 +214,11 @@ if __name__ == "__main__":
     counties = counties.join(pop)
 
     # Indicator matrix counties -> grid cells
-    I = atlite.cutout.compute_indicatormatrix(counties.geometry, grid_cells)
+    I = cached_indicatormatrix(
+        counties.geometry,
+        grid_cells,
+        snakemake.config["atlite"].get("cache_dir"),
+    )
 
     # population in each grid cell
     cell_pop = pd.Series(I.dot(counties["population"]))
@@ -17,6 +17,9 @@ under water.
 
     atlite:
         nprocesses:
+        cache_dir:
+        combined_profiles:
+        time_window:
 
     renewable:
         {technology}:
@@ -132,6 +135,25 @@ cutout grid cell and each node using the `GLAES
 <https://github.com/FZJ-IEK3-VSA/glaes>`_ library. This uses the CORINE land use data,
 Natura2000 nature reserves and GEBCO bathymetry data.
 
+The resulting availability matrix is stored in ``atlite: cache_dir:`` under a
+hash of the exclusion settings, their input files, the regions and the cutout
+grid, so reruns and technologies with identical screens skip this step.
+
+With ``atlite: combined_profiles: true`` the rule
+``build_renewable_profiles_combined`` computes all renewable technologies of
+an interconnect in one job. Technologies sharing a cutout then read the
+required weather variables only once per time window and share one dask
+cluster, while the outputs stay the per technology ``profile_{technology}.nc``
+files. Without ``atlite: time_window:`` the only window is the full year, so
+its weather variables of the whole cutout are held in memory at once.
+
+Converting the weather data of a large cutout at once needs memory for full
+year arrays over the whole grid. ``atlite: time_window:`` (a pandas period
+frequency such as ``M``) converts the cutout window by window instead: the
+capacity factors are averaged over the windows and each profile window is
+written to a temporary file, so that peak memory scales with the window
+length rather than the number of snapshots.
+
 To compute the layout of generators in each node's Voronoi cell, the
 installable potential in each grid cell is multiplied with the capacity factor
 at each grid cell. This is done since we assume more generators are installed
@@ -156,80 +178,401 @@ node (`p_nom_max`): `simple` and `conservative`:
 
 
 import functools
+import hashlib
 import logging
+import os
+import tempfile
 import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
 
 import atlite
 import geopandas as gpd
 import numpy as np
 import pandas as pd
+import shapely
 import xarray as xr
-from _helpers import configure_logging
+from _helpers import configure_logging, file_checksum, geometry_checksum
 from dask.distributed import Client
-from pypsa.geo import haversine
-from shapely.geometry import LineString
+from pypsa.geo import haversine_pts
+from scipy import sparse
 
 logger = logging.getLogger(__name__)
 
+# cutout features read by the atlite conversion methods
+CONVERSION_FEATURES = {
+    "pv": ["influx", "temperature"],
+    "wind": ["wind"],
+}
+
+
+def _file_fingerprint(path):
+    """
+    Identifies a file by its resolved path, size and modification time rather
+    than hashing its content.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _fingerprint_entry(entry, key):
+    """
+    Describes an excluder raster or geometry.
+
+    Raster files are identified by path, size and modification time, as
+    hashing the multi-GB rasters would cost as much I/O as the availability
+    calculation itself. Geometry files are small and hashed by content.
+    """
+    entry = dict(entry)
+    source = entry.pop(key)
+    if isinstance(source, (str, os.PathLike)):
+        if key == "raster":
+            source = _file_fingerprint(source)
+        else:
+            source = file_checksum(source)
+    elif isinstance(source, (gpd.GeoSeries, gpd.GeoDataFrame)):
+        source = geometry_checksum(source.geometry)
+    return repr((source, sorted(entry.items())))
+
+
+def get_availability_cache_key(excluder, regions_path, cutout):
+    """
+    Hash of everything the land use availability depends on.
+
+    This covers the excluder resolution and CRS, every raster and geometry
+    with its screening settings and file, the regions file and the cutout
+    grid. The time range of the cutout is irrelevant for the availability
+    and therefore not part of the key.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(repr((excluder.crs, excluder.res)).encode())
+    for raster in excluder.rasters:
+        hasher.update(_fingerprint_entry(raster, "raster").encode())
+    for geometry in excluder.geometries:
+        hasher.update(_fingerprint_entry(geometry, "geometry").encode())
+    hasher.update(file_checksum(regions_path).encode())
+    hasher.update(repr(cutout.crs).encode())
+    hasher.update(cutout.data.x.values.tobytes())
+    hasher.update(cutout.data.y.values.tobytes())
+    return hasher.hexdigest()
+
+
+def save_availability(availability, path):
+    """
+    Stores the (bus, y, x) availability matrix in compressed sparse format.
+    """
+    matrix = sparse.csr_matrix(
+        availability.transpose("bus", "y", "x").values.reshape(
+            len(availability.bus), -1
+        ),
+    )
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(
+        tmp,
+        data=matrix.data,
+        indices=matrix.indices,
+        indptr=matrix.indptr,
+        bus=availability.bus.values.astype(str),
+        y=availability.y.values,
+        x=availability.x.values,
+    )
+    os.replace(tmp, path)
+
+
+def load_availability(path):
+    """
+    Reads an availability matrix stored with ``save_availability``.
+    """
+    with np.load(path) as f:
+        shape = (len(f["bus"]), len(f["y"]) * len(f["x"]))
+        matrix = sparse.csr_matrix((f["data"], f["indices"], f["indptr"]), shape=shape)
+        return xr.DataArray(
+            matrix.toarray().reshape(len(f["bus"]), len(f["y"]), len(f["x"])),
+            coords=[("bus", f["bus"]), ("y", f["y"]), ("x", f["x"])],
+        )
 
-if __name__ == "__main__":
-    if "snakemake" not in globals():
-        from _helpers import mock_snakemake
 
-        snakemake = mock_snakemake(
-            "build_renewable_profiles",
-            technology="solar",
-            interconnect="eastern",
-        )
-    configure_logging(snakemake)
+def cached_availabilitymatrix(
+    cutout, regions, excluder, regions_path, cache_dir, **kwargs
+):
+    """
+    Returns ``cutout.availabilitymatrix(regions, excluder)``, reusing a
+    previous result with identical inputs from ``cache_dir``.
+    """
+    if not cache_dir:
+        return cutout.availabilitymatrix(regions, excluder, **kwargs)
 
-    nprocesses = int(snakemake.threads)
-    noprogress = snakemake.config["run"].get("disable_progressbar", True)
-    noprogress = noprogress or not snakemake.config["atlite"]["show_progress"]
-    params = snakemake.params.renewable[snakemake.wildcards.technology]
-    resource = params["resource"]  # pv panel params / wind turbine params
-    correction_factor = params.get("correction_factor", 1.0)
-    capacity_per_sqkm = params["capacity_per_sqkm"]
-    p_nom_max_meth = params.get("potential", "conservative")
+    key = get_availability_cache_key(excluder, regions_path, cutout)
+    path = Path(cache_dir, f"availability_{key}.npz")
+    if path.exists():
+        logger.info(f"Reading cached landuse availability from {path}")
+        return load_availability(path)
+
+    availability = cutout.availabilitymatrix(regions, excluder, **kwargs)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    save_availability(availability, path)
+    return availability
+
+
+def calculate_layout_distances(layoutmatrix, bus_coords, coords):
+    """
+    Calculates the layout weighted average distance and centre of mass of
+    the grid cells of all buses.
+
+    Parameters
+    ----------
+    layoutmatrix : xr.DataArray
+        Layout of each bus over the stacked (y, x) ``spatial`` dimension.
+    bus_coords : pd.DataFrame
+        x and y coordinates of the buses, in the order of ``layoutmatrix.bus``.
+    coords : pd.DataFrame
+        x and y coordinates of the grid cells, in the order of ``spatial``.
+
+    Returns
+    -------
+    average_distance : xr.DataArray
+        Average distance in km of the layout to the bus.
+    centre_of_mass : xr.DataArray
+        x and y coordinates of the centre of mass of the layout.
+    """
+    buses = layoutmatrix.indexes["bus"]
+    matrix = sparse.csr_matrix(layoutmatrix.transpose("bus", "spatial").values)
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+
+    row_sums = np.asarray(matrix.sum(axis=1)).ravel()
+    weights = sparse.csr_matrix(
+        (matrix.data / row_sums[rows], matrix.indices, matrix.indptr),
+        shape=matrix.shape,
+    )
+    distances = haversine_pts(
+        bus_coords.values[rows],
+        coords.values[matrix.indices],
+    )
 
-    if isinstance(params.get("corine", {}), list):
-        params["corine"] = {"grid_codes": params["corine"]}
+    average_distance = np.bincount(
+        rows,
+        weights=distances * weights.data,
+        minlength=len(buses),
+    )
+    centre_of_mass = weights @ coords.values
 
-    if correction_factor != 1.0:
-        logger.info(f"correction_factor is set as {correction_factor}")
+    average_distance = xr.DataArray(average_distance, [buses])
+    centre_of_mass = xr.DataArray(centre_of_mass, [buses, ("spatial", ["x", "y"])])
+    return average_distance, centre_of_mass
+
+
+def calculate_underwater_fraction(centre_of_mass, bus_coords, offshore_shapes):
+    """
+    Calculates the share of the connection line from the centre of mass of
+    each bus layout to the bus that runs through the offshore shapes.
+
+    All connection lines are intersected at once against the non-overlapping
+    parts of the merged offshore shapes. A spatial index over the lines
+    restricts the intersections to line and part pairs that actually meet.
+
+    Parameters
+    ----------
+    centre_of_mass : xr.DataArray
+        Centre of mass of each bus layout, see ``calculate_layout_distances``.
+    bus_coords : pd.DataFrame
+        x and y coordinates of the buses, in the order of ``centre_of_mass.bus``.
+    offshore_shapes : array_like of shapely.Geometry
+        Offshore shapes, may overlap each other.
+
+    Returns
+    -------
+    xr.DataArray
+        Underwater fraction of the connection of each bus.
+    """
+    buses = centre_of_mass.indexes["bus"]
+    points = np.stack(
+        [centre_of_mass.transpose("bus", "spatial").values, bus_coords.values],
+        axis=1,
+    )
+    lines = shapely.linestrings(points)
 
-    if nprocesses > 1:
-        client = Client(n_workers=nprocesses, threads_per_worker=1)
-    else:
-        client = None
+    # the query prepares each offshore part once and tests it against the
+    # indexed lines
+    parts = shapely.get_parts(shapely.union_all(offshore_shapes))
+    part_idx, line_idx = shapely.STRtree(lines).query(parts, predicate="intersects")
+    lengths = shapely.length(shapely.intersection(lines[line_idx], parts[part_idx]))
 
-    sns = pd.date_range(freq="h", **snakemake.config["snapshots"])
-    cutout = atlite.Cutout(snakemake.input.cutout).sel(time=sns)
+    underwater_length = np.bincount(line_idx, weights=lengths, minlength=len(buses))
+    return xr.DataArray(underwater_length / shapely.length(lines), [buses])
+
+
+def technology_file(files, key, technology):
+    """
+    Returns the ``{key}_{technology}`` file of the combined rule or the
+    ``key`` file of the single technology rule.
+    """
+    return files.get(f"{key}_{technology}", files.get(key))
 
-    regions = gpd.read_file(snakemake.input.regions)
+
+def read_regions(path):
+    regions = gpd.read_file(path)
     assert not regions.empty, (
-        f"List of regions in {snakemake.input.regions} is empty, please "
+        f"List of regions in {path} is empty, please "
         "disable the corresponding renewable technology"
     )
     # do not pull up, set_index does not work if geo dataframe is empty
-    regions = regions.set_index("name").rename_axis("bus")
-    buses = regions.index
+    return regions.set_index("name").rename_axis("bus")
+
+
+def load_cutout_features(cutout, methods, client=None):
+    """
+    Reads the weather variables required by the conversion ``methods`` into
+    memory, so that the conversions of all technologies on this cutout share
+    a single read of the cutout file.
+
+    With a dask client the variables are persisted on its workers instead.
+    """
+    features = set()
+    for method in methods:
+        features.update(CONVERSION_FEATURES.get(method, []))
+    variables = [
+        v
+        for v in cutout.data.data_vars
+        if cutout.data[v].attrs.get("feature") in features
+    ]
+    if not variables:
+        return
+
+    logger.info(f"Loading cutout variables {', '.join(variables)} once for {methods}")
+    data = cutout.data[variables]
+    data = data.persist() if client is not None else data.compute()
+    cutout.data = cutout.data.assign(data)
+
+
+@contextmanager
+def shared_cutout_features(cutout, methods, client=None):
+    """
+    Loads the weather variables required by several conversion ``methods``
+    for the duration of the context, see ``load_cutout_features``.
+
+    Afterwards the cutout reads its variables lazily again, so that only the
+    variables of the current time window are held in memory.
+    """
+    data = cutout.data
+    if len(methods) > 1:
+        load_cutout_features(cutout, methods, client)
+    try:
+        yield cutout
+    finally:
+        cutout.data = data
+
+
+def get_cutout_area(cutout):
+    area = cutout.grid.to_crs("ESRI:54009").area / 1e6
+    return xr.DataArray(
+        area.values.reshape(cutout.shape),
+        [cutout.coords["y"], cutout.coords["x"]],
+    )
+
 
+def split_time_windows(cutout, freq=None):
+    """
+    Splits the cutout into consecutive time windows of the pandas period
+    frequency ``freq``, e.g. ``M`` for months.
+
+    Without ``freq`` the full cutout is returned as the only window.
+    """
+    if not freq:
+        return [cutout]
+    time = cutout.data.indexes["time"]
+    periods = time.to_period(freq)
+    return [cutout.sel(time=time[periods == p]) for p in periods.unique()]
+
+
+def calculate_capacity_factors(windows, conversions, client=None):
+    """
+    Calculates the time averaged capacity factor of each conversion as the
+    length weighted mean over the time windows.
+
+    ``conversions`` maps names to a conversion method and its ``resource``
+    arguments. The conversions of a window share one read of its weather
+    variables.
+    """
+    methods = [method for method, _ in conversions.values()]
+    capacity_factors = dict.fromkeys(conversions, 0)
+    num_snapshots = 0
+    for window in windows:
+        num_window_snapshots = len(window.data.indexes["time"])
+        with shared_cutout_features(window, methods, client):
+            for name, (method, resource) in conversions.items():
+                func = getattr(window, method)
+                capacity_factor = func(capacity_factor=True, **resource)
+                capacity_factors[name] += capacity_factor * num_window_snapshots
+        num_snapshots += num_window_snapshots
+    return {name: cf / num_snapshots for name, cf in capacity_factors.items()}
+
+
+def calculate_profiles(windows, conversions, client=None, tmpdir=None):
+    """
+    Calculates the per unit profile and the capacities of the buses of each
+    conversion window by window.
+
+    ``conversions`` maps names to a conversion method and its arguments,
+    including ``matrix``, ``layout`` and ``index``. The conversions of a
+    window share one read of its weather variables.
+
+    With ``tmpdir`` every profile window is written to a file in it once
+    converted and the returned profile is read lazily from these files.
+    Otherwise the windows are concatenated in memory.
+    """
+    methods = [method for method, _ in conversions.values()]
+    profiles = {name: [] for name in conversions}
+    capacities = {}
+    for i, window in enumerate(windows):
+        with shared_cutout_features(window, methods, client):
+            for name, (method, resource) in conversions.items():
+                func = getattr(window, method)
+                profile, capacities[name] = func(
+                    per_unit=True,
+                    return_capacity=True,
+                    **resource,
+                )
+                if tmpdir is not None:
+                    path = Path(tmpdir, f"profile_{name}_{i}.nc")
+                    profile.rename("profile").to_netcdf(path)
+                    profile = path
+                profiles[name].append(profile)
+
+    results = {}
+    for name, windows_profiles in profiles.items():
+        if tmpdir is not None:
+            profile = xr.open_mfdataset(
+                windows_profiles,
+                combine="nested",
+                concat_dim="time",
+            )
+            profile = profile["profile"]
+        elif len(windows_profiles) > 1:
+            profile = xr.concat(windows_profiles, dim="time")
+        else:
+            profile = windows_profiles[0]
+        # the capacities only depend on the layout and are the same for each window
+        results[name] = profile, capacities[name]
+    return results
+
+
+def build_excluder(params, inputs, technology):
     res = params.get("excluder_resolution", 100)
     excluder = atlite.ExclusionContainer(crs=5070, res=res)
 
     if params["natura"]:
-        excluder.add_raster(snakemake.input.natura, nodata=0, allow_no_overlap=True)
+        excluder.add_raster(inputs.natura, nodata=0, allow_no_overlap=True)
 
     corine = params.get("corine", {})
     if "grid_codes" in corine:
         codes = corine["grid_codes"]
-        excluder.add_raster(snakemake.input.corine, codes=codes, invert=True, crs=4326)
+        excluder.add_raster(inputs.corine, codes=codes, invert=True, crs=4326)
     if corine.get("distance", 0.0) > 0.0:
         codes = corine["distance_grid_codes"]
         buffer = corine["distance"]
         excluder.add_raster(
-            snakemake.input.corine,
+            inputs.corine,
             codes=codes,
             buffer=buffer,
             crs=4326,
@@ -237,14 +580,14 @@ if __name__ == "__main__":
 
     if params.get("cec", 0):
         excluder.add_raster(
-            snakemake.input[f"cec_{snakemake.wildcards.technology}"],
+            inputs[f"cec_{technology}"],
             nodata=0,
             allow_no_overlap=True,
         )
 
     if params.get("boem_screen", 0):
         excluder.add_raster(
-            snakemake.input[f"boem_osw"],
+            inputs[f"boem_osw"],
             invert=True,
             nodata=0,
             allow_no_overlap=True,
@@ -256,7 +599,7 @@ if __name__ == "__main__":
         )  # approximation because 6 years of data which is hourly collected
         func = functools.partial(np.less, shipping_threshold)
         excluder.add_raster(
-            snakemake.input.ship_density,
+            inputs.ship_density,
             codes=func,
             crs=4326,
             allow_no_overlap=True,
@@ -267,58 +610,168 @@ if __name__ == "__main__":
         # use named function np.greater with partially frozen argument instead
         # and exclude areas where: -max_depth > grid cell depth
         func = functools.partial(np.greater, -params["max_depth"])
-        excluder.add_raster(snakemake.input.gebco, codes=func, crs=4326, nodata=-1000)
+        excluder.add_raster(inputs.gebco, codes=func, crs=4326, nodata=-1000)
 
     if params.get("min_depth"):
         # lambda not supported for atlite + multiprocessing
         # use named function np.greater with partially frozen argument instead
         # and exclude areas where: -min_depth < grid cell depth
         func = functools.partial(np.less, -params["min_depth"])
-        excluder.add_raster(snakemake.input.gebco, codes=func, crs=4326, nodata=-1000)
+        excluder.add_raster(inputs.gebco, codes=func, crs=4326, nodata=-1000)
 
     if "min_shore_distance" in params:
         buffer = params["min_shore_distance"]
-        excluder.add_geometry(snakemake.input.country_shapes, buffer=buffer)
+        excluder.add_geometry(inputs.country_shapes, buffer=buffer)
 
     if "max_shore_distance" in params:
         buffer = params["max_shore_distance"]
         excluder.add_geometry(
-            snakemake.input.country_shapes,
+            inputs.country_shapes,
             buffer=buffer,
             invert=True,
         )
 
-    # excluder.plot_shape_availability(regions)
-
-    logger.info("Calculate landuse availability...")
-    start = time.time()
-
-    kwargs = dict(nprocesses=nprocesses, disable_progressbar=noprogress)
-    availability = cutout.availabilitymatrix(regions, excluder, **kwargs)
-
-    duration = time.time() - start
-    logger.info(f"Completed landuse availability calculation ({duration:2.2f}s)")
+    return excluder
+
+
+def build_renewable_profiles(
+    technologies,
+    renewable,
+    cutout,
+    area,
+    inputs,
+    client=None,
+    nprocesses=1,
+    noprogress=True,
+    cache_dir=None,
+    time_window=None,
+    tmpdir=None,
+):
+    """
+    Calculates the profiles, potentials and connection distances of the
+    renewable ``technologies`` on an already opened cutout.
+
+    The weather conversions of all technologies run together, so that each
+    time window of the cutout is read once for all of them. With
+    ``time_window`` the weather conversion runs window by window, see
+    ``split_time_windows``, and only the weather variables of one window are
+    held in memory. The profile windows are then stored in ``tmpdir`` and the
+    returned datasets read them lazily, so ``tmpdir`` has to persist until
+    the datasets are written.
+
+    Returns
+    -------
+    dict
+        Dataset of each technology.
+    """
+    technologies_params = {}
+    resources = {}
+    for technology in technologies:
+        params = renewable[technology].copy()
+        resource = params["resource"].copy()  # pv panel params / wind turbine params
+        correction_factor = params.get("correction_factor", 1.0)
+
+        if isinstance(params.get("corine", {}), list):
+            params["corine"] = {"grid_codes": params["corine"]}
+
+        if correction_factor != 1.0:
+            logger.info(f"correction_factor is set as {correction_factor}")
+
+        regions_path = technology_file(inputs, "regions", technology)
+        regions = read_regions(regions_path)
+
+        excluder = build_excluder(params, inputs, technology)
+
+        # excluder.plot_shape_availability(regions)
+
+        logger.info(f"Calculate landuse availability for {technology}...")
+        start = time.time()
+
+        kwargs = dict(nprocesses=nprocesses, disable_progressbar=noprogress)
+        availability = cached_availabilitymatrix(
+            cutout,
+            regions,
+            excluder,
+            regions_path,
+            cache_dir,
+            **kwargs,
+        )
 
-    area = cutout.grid.to_crs("ESRI:54009").area / 1e6
-    area = xr.DataArray(
-        area.values.reshape(cutout.shape),
-        [cutout.coords["y"], cutout.coords["x"]],
-    )
+        duration = time.time() - start
+        logger.info(f"Completed landuse availability calculation ({duration:2.2f}s)")
+
+        method = resource.pop("method")
+        if client is not None:
+            resource["dask_kwargs"] = {"scheduler": client}
+        technologies_params[technology] = params, regions, availability
+        resources[technology] = method, resource
+
+    windows = split_time_windows(cutout, time_window)
+    if len(windows) > 1:
+        logger.info(f"Converting weather data in {len(windows)} time windows")
+
+    with ExitStack() as stack:
+        if len(windows) == 1:
+            # a single window is read once for both conversion passes
+            methods = [method for method, _ in resources.values()]
+            stack.enter_context(shared_cutout_features(windows[0], methods, client))
+        capacity_factors = calculate_capacity_factors(windows, resources, client)
+
+        conversions = {}
+        for technology, (params, regions, availability) in technologies_params.items():
+            method, resource = resources[technology]
+            correction_factor = params.get("correction_factor", 1.0)
+            capacity_factors[technology] *= correction_factor
+            layout = capacity_factors[technology] * area * params["capacity_per_sqkm"]
+            conversions[technology] = method, dict(
+                matrix=availability.stack(spatial=["y", "x"]),
+                layout=layout,
+                index=regions.index,
+                **resource,
+            )
+        profiles = calculate_profiles(windows, conversions, client, tmpdir)
+
+    datasets = {}
+    for technology, (params, regions, availability) in technologies_params.items():
+        profile, capacities = profiles[technology]
+        datasets[technology] = finish_renewable_profile(
+            technology,
+            params,
+            cutout,
+            area,
+            inputs,
+            regions,
+            availability,
+            capacity_factors[technology],
+            conversions[technology][1]["layout"],
+            profile,
+            capacities,
+        )
+    return datasets
+
+
+def finish_renewable_profile(
+    technology,
+    params,
+    cutout,
+    area,
+    inputs,
+    regions,
+    availability,
+    capacity_factor,
+    layout,
+    profile,
+    capacities,
+):
+    """
+    Calculates the potentials and connection distances of a technology from
+    its converted weather data and assembles its dataset.
+    """
+    correction_factor = params.get("correction_factor", 1.0)
+    capacity_per_sqkm = params["capacity_per_sqkm"]
+    p_nom_max_meth = params.get("potential", "conservative")
 
     potential = capacity_per_sqkm * availability.sum("bus") * area
-    func = getattr(cutout, resource.pop("method"))
-    if client is not None:
-        resource["dask_kwargs"] = {"scheduler": client}
-    capacity_factor = correction_factor * func(capacity_factor=True, **resource)
-    layout = capacity_factor * area * capacity_per_sqkm
-    profile, capacities = func(
-        matrix=availability.stack(spatial=["y", "x"]),
-        layout=layout,
-        index=buses,
-        per_unit=True,
-        return_capacity=True,
-        **resource,
-    )
 
     logger.info(f"Calculating maximal capacity per bus (method '{p_nom_max_meth}')")
     if p_nom_max_meth == "simple":
@@ -335,22 +788,11 @@ if __name__ == "__main__":
     logger.info("Calculate average distances.")
     layoutmatrix = (layout * availability).stack(spatial=["y", "x"])
 
-    coords = cutout.grid[["x", "y"]]
-    bus_coords = regions[["x", "y"]]
-
-    average_distance = []
-    centre_of_mass = []
-    for bus in buses:
-        row = layoutmatrix.sel(bus=bus).data
-        nz_b = row != 0
-        row = row[nz_b]
-        co = coords[nz_b]
-        distances = haversine(bus_coords.loc[bus], co)
-        average_distance.append((distances * (row / row.sum())).sum())
-        centre_of_mass.append(co.values.T @ (row / row.sum()))
-
-    average_distance = xr.DataArray(average_distance, [buses])
-    centre_of_mass = xr.DataArray(centre_of_mass, [buses, ("spatial", ["x", "y"])])
+    average_distance, centre_of_mass = calculate_layout_distances(
+        layoutmatrix,
+        regions[["x", "y"]],
+        cutout.grid[["x", "y"]],
+    )
 
     ds = xr.merge(
         [
@@ -361,30 +803,97 @@ if __name__ == "__main__":
             average_distance.rename("average_distance"),
         ],
     )
-    if snakemake.wildcards.technology.startswith("offwind"):
+    if technology.startswith("offwind"):
         logger.info("Calculate underwater fraction of connections.")
-        offshore_shape = gpd.read_file(snakemake.input["offshore_shapes"]).unary_union
-        underwater_fraction = []
-        for bus in buses:
-            p = centre_of_mass.sel(bus=bus).data
-            line = LineString([p, regions.loc[bus, ["x", "y"]]])
-            frac = line.intersection(offshore_shape).length / line.length
-            underwater_fraction.append(frac)
-
-        ds["underwater_fraction"] = xr.DataArray(underwater_fraction, [buses])
+        offshore_shapes = gpd.read_file(inputs["offshore_shapes"])
+        ds["underwater_fraction"] = calculate_underwater_fraction(
+            centre_of_mass,
+            regions[["x", "y"]],
+            offshore_shapes.geometry.values,
+        )
 
     # select only buses with some capacity and minimal capacity factor
     ds = ds.sel(
         bus=(
             (ds["profile"].mean("time") > params.get("min_p_max_pu", 0.0))
             & (ds["p_nom_max"] > params.get("min_p_nom_max", 0.0))
-        ),
+        ).compute(),
     )
 
     if "clip_p_max_pu" in params:
         min_p_max_pu = params["clip_p_max_pu"]
         ds["profile"] = ds["profile"].where(ds["profile"] >= min_p_max_pu, 0)
 
-    ds.to_netcdf(snakemake.output.profile)
+    return ds
+
+
+if __name__ == "__main__":
+    if "snakemake" not in globals():
+        from _helpers import mock_snakemake
+
+        snakemake = mock_snakemake(
+            "build_renewable_profiles",
+            technology="solar",
+            interconnect="eastern",
+        )
+    configure_logging(snakemake)
+
+    nprocesses = int(snakemake.threads)
+    noprogress = snakemake.config["run"].get("disable_progressbar", True)
+    noprogress = noprogress or not snakemake.config["atlite"]["show_progress"]
+    cache_dir = snakemake.config["atlite"].get("cache_dir")
+    time_window = snakemake.config["atlite"].get("time_window")
+    renewable = snakemake.params.renewable
+
+    if snakemake.rule == "build_renewable_profiles_combined":
+        technologies = snakemake.params.technologies
+    else:
+        technologies = [snakemake.wildcards.technology]
+
+    if nprocesses > 1:
+        client = Client(n_workers=nprocesses, threads_per_worker=1)
+    else:
+        client = None
+
+    sns = pd.date_range(freq="h", **snakemake.config["snapshots"])
+
+    # technologies sharing a cutout are computed from a single read of it
+    cutouts = {}
+    for technology in technologies:
+        path = technology_file(snakemake.input, "cutout", technology)
+        cutouts.setdefault(path, []).append(technology)
+
+    for path, cutout_technologies in cutouts.items():
+        cutout = atlite.Cutout(path).sel(time=sns)
+        area = get_cutout_area(cutout)
+
+        with ExitStack() as stack:
+            tmpdir = None
+            if time_window:
+                output = technology_file(
+                    snakemake.output,
+                    "profile",
+                    cutout_technologies[0],
+                )
+                tmpdir = stack.enter_context(
+                    tempfile.TemporaryDirectory(dir=Path(output).parent),
+                )
+            datasets = build_renewable_profiles(
+                cutout_technologies,
+                renewable,
+                cutout,
+                area,
+                snakemake.input,
+                client=client,
+                nprocesses=nprocesses,
+                noprogress=noprogress,
+                cache_dir=cache_dir,
+                time_window=time_window,
+                tmpdir=tmpdir,
+            )
+            for technology, ds in datasets.items():
+                ds.to_netcdf(technology_file(snakemake.output, "profile", technology))
+                ds.close()
+
     if client is not None:
         client.shutdown()
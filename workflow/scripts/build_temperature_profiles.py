@@ -7,6 +7,7 @@ import geopandas as gpd
 import numpy as np
 import pandas as pd
 import xarray as xr
+from _helpers import cached_indicatormatrix
 from dask.distributed import Client, LocalCluster
 
 if __name__ == "__main__":
@@ -35,7 +36,12 @@ if __name__ == "__main__":
         .squeeze()
     )
 
-    I = cutout.indicatormatrix(clustered_regions)
+    I = cached_indicatormatrix(
+        cutout.grid.geometry,
+        clustered_regions,
+        snakemake.config["atlite"].get("cache_dir"),
+        orig_crs=cutout.crs,
+    )
 
     pop_layout = xr.open_dataarray(snakemake.input.pop_layout)
 
@@ -9,6 +9,9 @@ Public Classes include:
 - Storage(fuel, storage, year, api)
 - Emissions(sector, year, api, fuel)
 
+API responses are cached on disk after calling configure_cache(cache_dir, ttl, offline).
+Many requests are retrieved concurrently with get_batch_data(products).
+
 Examples:
 >>> costs = FuelCosts("gas", "power", 2020, "xxxxxxxxxxxxxxxx")
 >>> costs.get_data()
@@ -34,10 +37,19 @@ period
 2020-12-01  Wyoming Price of Natural Gas Delivered to Resi...   8.00  $/MCF Wyoming
 """
 
+import gzip
+import hashlib
+import json
 import logging
 import math
+import os
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Dict, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 import constants
 import numpy as np
@@ -53,6 +65,130 @@ API_BASE = "https://api.eia.gov/v2/"
 
 STATE_CODES = constants.STATE_2_CODE
 
+# on-disk cache of API responses, see configure_cache()
+CACHE = {"cache_dir": None, "ttl": None, "offline": False}
+
+
+def configure_cache(
+    cache_dir: str | None = None,
+    ttl: float | None = None,
+    offline: bool = False,
+) -> None:
+    """
+    Sets up the cache of EIA API responses for this process.
+
+    cache_dir: str
+        Directory of the gzipped json responses, no caching if empty
+    ttl: float
+        Days after which cached responses are requested again, never if empty
+    offline: bool
+        Only serve responses from the cache and fail on a miss
+    """
+    if offline and not cache_dir:
+        raise ValueError("EIA offline mode requires a cache directory")
+    CACHE.update(cache_dir=cache_dir, ttl=ttl, offline=offline)
+
+
+class EiaClient:
+    """
+    Retrieves EIA API responses over a single pooled session.
+
+    Requests are spaced to at most max_rate per second over all threads and
+    responses are kept in memory, so data prefetched with get_batch_data()
+    is not requested again within the process.
+
+    max_workers: int
+        Number of concurrent requests of get_batch_data()
+    max_rate: float
+        Maximum number of requests per second
+    """
+
+    def __init__(self, max_workers: int = 4, max_rate: float = 5.0) -> None:
+        self.max_workers = max_workers
+        self.max_rate = max_rate
+        self._lock = threading.Lock()
+        self._next_request = 0.0
+        self._responses = {}
+
+        # sometimes running into HTTPSConnectionPool error. adding in retries helped
+        retries = Retry(
+            total=3,
+            backoff_factor=0.1,
+            status_forcelist=[500, 502, 503, 504],
+        )
+        adapter = HTTPAdapter(
+            max_retries=retries,
+            pool_connections=1,
+            pool_maxsize=max_workers,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+
+    def get(self, url: str) -> dict[str, dict | str]:
+        """
+        Returns the json response of the url.
+        """
+        key = DataExtractor._cache_key(url)
+        if key in self._responses:
+            return self._responses[key]
+
+        self._wait()
+        response = self.session.get(url, timeout=10)
+        if response.status_code == 200:
+            data = response.json()  # Assumes the response is in JSON format
+        else:
+            logger.error(f"EIA Request failed with status code: {response.status_code}")
+            raise requests.ConnectionError(f"Status code {response.status_code}")
+
+        self._responses[key] = data
+        return data
+
+    def get_data(self, products: list, pivot: bool = False) -> list[pd.DataFrame]:
+        """
+        Calls get_data() of each EiaData concurrently.
+
+        Results are returned in the order of products.
+        """
+        if len(products) < 2 or self.max_workers < 2:
+            return [product.get_data(pivot=pivot) for product in products]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lambda x: x.get_data(pivot=pivot), products))
+
+    def _wait(self) -> None:
+        """
+        Blocks until the next request is within the rate limit.
+        """
+        if not self.max_rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_request)
+            self._next_request = start + 1 / self.max_rate
+        time.sleep(start - now)
+
+
+_CLIENT = {}
+
+
+def get_client() -> EiaClient:
+    """
+    Returns the client of this process, creating it on first use.
+    """
+    pid = os.getpid()
+    if pid not in _CLIENT:
+        _CLIENT.clear()  # do not share sessions with a parent process
+        _CLIENT[pid] = EiaClient()
+    return _CLIENT[pid]
+
+
+def get_batch_data(products: list, pivot: bool = False) -> list[pd.DataFrame]:
+    """
+    Retrieves the data of many EiaData objects concurrently.
+
+    >>> get_batch_data([Storage("gas", x, 2020, api) for x in ("base", "working")])
+    """
+    return get_client().get_data(products, pivot=pivot)
+
 
 # exceptions
 class InputException(Exception):
@@ -283,26 +419,54 @@ class DataExtractor(ABC):
     @staticmethod
     def _request_eia_data(url: str) -> dict[str, dict | str]:
         """
-        Retrieves data from EIA API.
+        Retrieves data from EIA API, or from the response cache if configured.
 
         url in the form of "https://api.eia.gov/v2/" followed by api key and facets
         """
+        cache_dir, ttl, offline = CACHE["cache_dir"], CACHE["ttl"], CACHE["offline"]
+        if not cache_dir:
+            return DataExtractor._get_eia_data(url)
+
+        key = DataExtractor._cache_key(url)
+        path = Path(cache_dir, f"{hashlib.sha256(key.encode()).hexdigest()}.json.gz")
+
+        if path.exists():
+            age = (time.time() - path.stat().st_mtime) / 86400
+            if offline or ttl is None or age < ttl:
+                with gzip.open(path, "rt") as f:
+                    return json.load(f)
+        if offline:
+            raise requests.ConnectionError(
+                f"EIA offline mode: no cached response for {key}",
+            )
 
-        # sometimes running into HTTPSConnectionPool error. adding in retries helped
-        session = requests.Session()
-        retries = Retry(
-            total=3,
-            backoff_factor=0.1,
-            status_forcelist=[500, 502, 503, 504],
-        )
-        session.mount("https://", HTTPAdapter(max_retries=retries))
+        data = DataExtractor._get_eia_data(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp, "wt") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+        return data
 
-        response = session.get(url, timeout=10)
-        if response.status_code == 200:
-            return response.json()  # Assumes the response is in JSON format
-        else:
-            logger.error(f"EIA Request failed with status code: {response.status_code}")
-            raise requests.ConnectionError(f"Status code {response.status_code}")
+    @staticmethod
+    def _cache_key(url: str) -> str:
+        """
+        Returns the url without the api key.
+        """
+        parts = urlsplit(url)
+        query = [
+            (k, v)
+            for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if k != "api_key"
+        ]
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    @staticmethod
+    def _get_eia_data(url: str) -> dict[str, dict | str]:
+        """
+        Requests data from EIA API through the pooled client of this process.
+        """
+        return get_client().get(url)
 
     @staticmethod
     def _format_period(dates: pd.Series) -> pd.Series:
@@ -9,11 +9,18 @@ This scripts stochastic samples for power systems models based on the Mean-Rever
 import glob
 import os
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-import xarray as xr
+from scipy import sparse
+from scipy.special import log_ndtr, ndtri_exp
+
+# smallest positive float, keeps the log of a zero cdf share finite
+TINY = np.finfo(float).tiny
 
 
 def import_profiles_from_folder(PATH_FILES):
@@ -89,55 +96,114 @@ def resample_and_group(base_data, area_mapping):
     return base_area_daily, base_area
 
 
-def create_allocation(base, mapping):
+class AreaAllocation:
     """
-    Creates an allocation of generation based on the mean of the base data.
+    Sparse operator downscaling area level profiles to generator level
+    profiles.
 
-    Args:
-        base (pandas.DataFrame): Input data to be resampled.
-        mapping (pandas.DataFrame): Dictionary mapping column names to area ids.
+    The area to generator indicator matrix and the hourly share of each
+    generator in its area are built once from the base profiles, so
+    downscaling a sampled area profile is a single sparse-dense product.
 
-    Returns:
-        pandas.DataFrame: Hourly allocation of generation based on the mean of the base data.
+    Args:
+        base (pandas.DataFrame): Hourly generator level base profiles.
+        mapping (pandas.DataFrame): Dataframe mapping generator names to area ids.
+        min_value (float): Base values below this are not allocated any generation.
     """
-    base_ = base.copy().reset_index(drop=True)
-    total_area_hourly = base_.groupby(
-        base_.columns.map(mapping.to_dict()["area_id"]),
-        axis=1,
-    ).sum()
-    base_.columns = base.columns.map(mapping.to_dict()["area_id"])
-    base_[base_ < 0.0001] = 0
-    allocation = base_.apply(lambda x: x / total_area_hourly.loc[:, x.name], axis=0)
-    allocation.fillna(0, inplace=True)
-    return allocation
 
+    def __init__(self, base, mapping, min_value=0.0001):
+        area_ids = base.columns.map(mapping["area_id"])
+        self.generators = base.columns
+        self.areas = pd.Index(area_ids.unique())
+        self.indicator = sparse.csr_array(
+            (
+                np.ones(len(area_ids)),
+                (self.areas.get_indexer(area_ids), np.arange(len(area_ids))),
+            ),
+            shape=(len(self.areas), len(area_ids)),
+        )
 
-def define_solar_hours(solar_profile, timestamps):
+        values = base.to_numpy(dtype=np.float64)
+        total_area_hourly = (self.indicator @ values.T).T
+        values = np.where(values < min_value, 0, values)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weights = values / self.spread(total_area_hourly)
+        self.weights = np.nan_to_num(weights, nan=0)
+
+    def spread(self, area_values):
+        """
+        Repeats (hours x areas) values for every generator of an area.
+        """
+        return (self.indicator.T @ np.asarray(area_values).T).T
+
+    def downscale(self, area_profile):
+        """
+        Allocates an area level profile to the generators.
+
+        Args:
+            area_profile (pandas.DataFrame): Hourly profile with area ids as columns.
+
+        Returns:
+            pandas.DataFrame: Hourly generator level profile, e.g. for n.generators_t.p_max_pu.
+        """
+        columns = area_profile.columns.astype(str).get_indexer(self.areas.astype(str))
+        if (columns < 0).any():
+            raise ValueError("Area profile is missing areas of the allocation")
+        generator_values = self.spread(area_profile.to_numpy()[:, columns])
+        return pd.DataFrame(
+            generator_values * self.weights,
+            index=area_profile.index,
+            columns=self.generators,
+        )
+
+
+def define_solar_hours(daytime_mask, hours_per_day=24):
     """
     Defines the first and last hour of the day for solar generation.
 
+    All areas are processed at once by reshaping the mask to (days, hours,
+    areas). The mask is expected to start at midnight of the first day.
+
     Args:
-        solar_profile (pandas.DataFrame): Solar generation profile.
-        timestamps (pandas.DataFrame): Timestamps for the solar generation profile.
+        daytime_mask (pandas.DataFrame): Hourly 1/0 solar generation mask with areas as columns.
+        hours_per_day (int): Number of hours per day.
 
     Returns:
-        pandas.DataFrame: First and last hour of the day for solar generation.
+        numpy.ndarray: First hour of the day with solar generation, of shape (hours, areas).
+        numpy.ndarray: Last hour of the day with solar generation, of shape (hours, areas).
+        numpy.ndarray: Index of the previous days last solar hour, set at the first solar hour of the day.
     """
-    first_hour, last_hour, yesterday_last_hour = np.zeros((3, len(solar_profile)))
-    last_selected_index = 0
-    timestamps = timestamps.copy(deep=True)
-    timestamps["solar_profile"] = pd.Series(solar_profile, name="solar_profile")
-
-    for _, day_of_year_df in timestamps.groupby("day_of_year"):
-        first_hour_idx = day_of_year_df.solar_profile.idxmax()
-        last_hour_idx = day_of_year_df.solar_profile[::-1].idxmax()
-        start_hour = day_of_year_df.solar_profile.idxmin()
-        first_hour[first_hour_idx] = 1
-        yesterday_last_hour[first_hour_idx] = (
-            0 if start_hour < 23 else last_selected_index
-        )
-        last_hour[last_hour_idx] = 1
-        last_selected_index = last_hour_idx
+    values = np.asarray(daytime_mask, dtype=np.float64)
+    n_hours, n_areas = values.shape
+    n_days = -(-n_hours // hours_per_day)
+    padding = ((0, n_days * hours_per_day - n_hours), (0, 0))
+    # pad an incomplete last day so padded hours are never the max or min
+    days_max = np.pad(values, padding, constant_values=-np.inf).reshape(
+        n_days,
+        hours_per_day,
+        n_areas,
+    )
+    days_min = np.pad(values, padding, constant_values=np.inf).reshape(
+        n_days,
+        hours_per_day,
+        n_areas,
+    )
+
+    day_start = np.arange(n_days)[:, None] * hours_per_day
+    first_hour_idx = day_start + days_max.argmax(axis=1)
+    last_hour_idx = day_start + hours_per_day - 1 - days_max[:, ::-1].argmax(axis=1)
+    start_hour = day_start + days_min.argmin(axis=1)
+    last_selected_index = np.vstack([np.zeros((1, n_areas)), last_hour_idx[:-1]])
+
+    first_hour, last_hour, yesterday_last_hour = np.zeros((3, n_hours, n_areas))
+    areas = np.broadcast_to(np.arange(n_areas), first_hour_idx.shape)
+    first_hour[first_hour_idx, areas] = 1
+    last_hour[last_hour_idx, areas] = 1
+    yesterday_last_hour[first_hour_idx, areas] = np.where(
+        start_hour < hours_per_day - 1,
+        0,
+        last_selected_index,
+    )
 
     return first_hour, last_hour, yesterday_last_hour
 
@@ -173,62 +239,162 @@ def assign_stochastic_mu(df_params, timestamp_reference, column_name="profile_ty
     return df_mu_hourly_unstack
 
 
-def sampling_warmup(df, thresholds, rng, min_steps=50):
+def build_sampler_arrays(
+    parameters,
+    timestamp_reference,
+    solar_tracking,
+    thresholds,
+):
+    """
+    Precomputes the contiguous arrays used by the mean-reversion sampler.
+
+    Args:
+        parameters (pandas.DataFrame): Concatenated load, solar and wind parameters with a sampling_id column.
+        timestamp_reference (pandas.DataFrame): Dataframe containing the timestamp reference.
+        solar_tracking (pandas.DataFrame): Previous sunset index for each hour and solar area.
+        thresholds (numpy.ndarray): Upper ratio threshold for each sampling id.
+
+    Returns:
+        dict: Season indexed mu, kai and sigma arrays, column masks and per-hour indices.
+    """
+    sampling_ids = parameters.sampling_id.unique()
+    seasons = np.sort(parameters.season.unique())
+    season_params = [
+        parameters[parameters.season == season]
+        .set_index("sampling_id")
+        .reindex(sampling_ids)
+        for season in seasons
+    ]
+    arrays = {
+        "sampling_ids": sampling_ids,
+        "mu": np.stack([df.mu.to_numpy(dtype=np.float64) for df in season_params]),
+        "kai": np.stack([df.kai.to_numpy(dtype=np.float64) for df in season_params]),
+        "sigma": np.stack(
+            [df.sigma.to_numpy(dtype=np.float64) for df in season_params],
+        ),
+        "thresholds": np.asarray(thresholds, dtype=np.float64),
+        "daily": pd.Index(sampling_ids).str.contains("daily"),
+        "solar": pd.Index(sampling_ids).str.contains("solar"),
+        "season_idx": np.searchsorted(seasons, timestamp_reference.season_num.values),
+        "solar_reset": (np.asarray(solar_tracking) > 0).any(axis=1),
+    }
+    return arrays
+
+
+def sample_ratios(arrays, rng, min_steps=50, resample_method="truncated"):
+    """
+    Samples one year of ratios for all sampling ids.
+
+    Args:
+        arrays (dict): Sampler arrays created by build_sampler_arrays.
+        rng (numpy.random.Generator): Random number generator.
+        min_steps (int): Minimum number of warmup steps to be performed.
+        resample_method (str): "truncated" or "rejection", see RESAMPLE_METHODS.
+
+    Returns:
+        numpy.ndarray: Sampled ratios of shape (hours, sampling ids).
+        numpy.ndarray: Sampled epsilon of shape (hours, sampling ids).
+    """
+    mu, kai, sigma = arrays["mu"], arrays["kai"], arrays["sigma"]
+    thresholds = arrays["thresholds"]
+    daily, solar = arrays["daily"], arrays["solar"]
+    season_idx, solar_reset = arrays["season_idx"], arrays["solar_reset"]
+    n_hours, n_ids = len(season_idx), mu.shape[1]
+    resample = RESAMPLE_METHODS[resample_method]
+
+    # columns held over the day, on solar reset hours the solar columns restart
+    hold = np.flatnonzero(daily)
+    hold_solar_reset = np.flatnonzero(daily & ~solar)
+
+    ratio = np.zeros((n_hours, n_ids))
+    epsilon = np.zeros((n_hours, n_ids))
+    ratio[0], epsilon[0] = sampling_warmup(
+        mu[0],
+        kai[0],
+        sigma[0],
+        thresholds,
+        rng,
+        min_steps,
+        resample_method,
+    )
+
+    for i in range(1, n_hours):
+        s = season_idx[i]
+        prev = ratio[i - 1]
+        eps = rng_eps(sigma[s], rng)
+        row = prev + kai[s] * (mu[s] - prev) + eps
+
+        if i % 24 != 0:
+            held = hold_solar_reset if solar_reset[i] else hold
+            row[held] = prev[held]
+            eps[hold] = epsilon[i - 1, hold]
+
+        if ((row > thresholds) | (row < 0)).any():
+            row, eps, _ = resample(row, sigma[s], thresholds, eps, rng)
+        ratio[i], epsilon[i] = row, eps
+
+    return ratio, epsilon
+
+
+def sampling_warmup(
+    mu,
+    kai,
+    sigma,
+    thresholds,
+    rng,
+    min_steps=50,
+    resample_method="truncated",
+):
     """
     Performs a warmup of the sampling.
 
     Args:
-        df (pandas.DataFrame): Dataframe containing the parameters for the ratio sample.
-        thresholds (pandas.DataFrame): Dataframe containing the thresholds for the ratio sample.
+        mu (numpy.ndarray): Winter mu for each sampling id.
+        kai (numpy.ndarray): Winter kai for each sampling id.
+        sigma (numpy.ndarray): Winter sigma for each sampling id.
+        thresholds (numpy.ndarray): Thresholds for the ratio sample.
         rng (numpy.random.Generator): Random number generator.
         min_steps (int): Minimum number of steps to be performed.
+        resample_method (str): "truncated" or "rejection", see RESAMPLE_METHODS.
 
     Returns:
-        pandas.DataFrame: Dataframe containing the first sample of the ratio and epsilon.
+        numpy.ndarray: First sample of the ratio.
+        numpy.ndarray: First sample of the epsilon.
     """
-    winter_params = df.query("season == 1")
-    ratio = winter_params.mu
+    resample = RESAMPLE_METHODS[resample_method]
+    ratio = mu.copy()
     for _ in range(min_steps):
-        eps = rng_eps(winter_params, rng)
-        ratio += winter_params.kai * (winter_params.mu - ratio) + eps
-        ratio, eps, na = resample_ratio(
-            ratio,
-            winter_params,
-            thresholds,
-            eps,
-            rng,
-            True,
-        )
+        eps = rng_eps(sigma, rng)
+        ratio += kai * (mu - ratio) + eps
+        ratio, eps, _ = resample(ratio, sigma, thresholds, eps, rng)
     return ratio, eps
 
 
 # idea: to better replicate inverter curtailment, i should retain out of threshold samples but maintain a seperate 'ratio' df that is the max(sample, 0) or min(sample, threshold))... this simplifies the need for re-sampling but retains proper distributional properties
 def resample_ratio(
     original_ratio,
-    params,
+    sigma,
     thresholds,
     original_epsilon,
     rng,
-    initialization,
 ):
     resample_count = 0
-    param_dict = params.sampling_id.to_dict()
-    while np.any(
-        np.logical_or(original_ratio > thresholds, original_ratio < 0),
-    ):  # if any values are out of bounds
-        resampled_ratio = original_ratio.copy(deep=True)
-        mask_to_resample = np.logical_or(
-            original_ratio > thresholds,
-            original_ratio < 0,
-        )  # mask of values to resample
+    original_ratio = original_ratio.copy()
+    original_epsilon = original_epsilon.copy()
+    mask_to_resample = np.logical_or(
+        original_ratio > thresholds,
+        original_ratio < 0,
+    )
+    while np.any(mask_to_resample):  # if any values are out of bounds
+        resampled_ratio = original_ratio.copy()
         resampled_epsilon = rng_eps(
-            params[mask_to_resample.values],
+            sigma[mask_to_resample],
             rng,
         )  # resample epsilon for values to resample
         resampled_ratio[mask_to_resample] = (
             original_ratio[mask_to_resample]
             - original_epsilon[mask_to_resample]
-            + resampled_epsilon.values
+            + resampled_epsilon
         )  # resample ratio. subtract original epsilon and add new epsilon
         resample_count += 1
 
@@ -240,529 +406,593 @@ def resample_ratio(
                 mask_to_resample,
                 np.logical_and(resampled_ratio < thresholds, resampled_ratio > 0),
             )
-
-            if np.any(
-                in_bounds_mask,
-            ):  # if any values are in bounds (i.e. resampling was successful), then update original ratio and epsilon so that we reduce the number of resampled values in the next iteration
-                if not initialization:
-                    resampled_epsilon.index = resampled_epsilon.index.map(param_dict)
-                original_ratio.loc[in_bounds_mask] = resampled_ratio[in_bounds_mask]
-                original_epsilon.loc[in_bounds_mask] = resampled_epsilon[
-                    in_bounds_mask
-                ].values
+            # if any values are in bounds (i.e. resampling was successful), then update original ratio and epsilon so that we reduce the number of resampled values in the next iteration
+            original_ratio[in_bounds_mask] = resampled_ratio[in_bounds_mask]
+            original_epsilon[in_bounds_mask] = resampled_epsilon[
+                in_bounds_mask[mask_to_resample]
+            ]
 
         else:  # if no values are out of bounds, then set original ratio to resampled ratio, and we are done.
-            original_ratio = resampled_ratio.copy(deep=True)
-            original_epsilon[mask_to_resample] = resampled_epsilon.values
+            original_ratio = resampled_ratio
+            original_epsilon[mask_to_resample] = resampled_epsilon
 
         if resample_count > 200:
-            print(resampled_ratio[in_bounds_mask])
             raise ValueError("Max number of iterations reached")
 
+        mask_to_resample = np.logical_or(
+            original_ratio > thresholds,
+            original_ratio < 0,
+        )
+
     return original_ratio, original_epsilon, resample_count
 
 
-def rng_eps(params, rng):
-    return rng.standard_normal(len(params)) * params.sigma
-
-
-################### Import Parameters ###################
-area_mapping_solar = pd.read_csv("parameters/pypsa_area_mapping_solar.csv", index_col=0)
-area_mapping_wind = pd.read_csv("parameters/pypsa_area_mapping_wind.csv", index_col=0)
-load_parameters = pd.read_csv("parameters/pypsa_load_parameters.csv", index_col=0)
-solar_parameters = pd.read_csv("parameters/pypsa_solar_parameters.csv", index_col=0)
-wind_parameters = pd.read_csv("parameters/pypsa_wind_parameters.csv", index_col=0)
-
-################### Parameters ###################
-num_samples = 10
-load_ratio_threshold = 5
-solar_ratio_threshold = 5
-wind_ratio_threshold = 100000
-year = 2016
-NETWORK_PATH = "/Users/kamrantehranchi/Local_Documents/pypsa-breakthroughenergy-usa/workflow/notebooks/elec_s_96_offwind_2.nc"
-num_clusters = 96
-
-################### Sampling ###################
-# %%
-load_base, solar_base, wind_base = import_profiles_from_network(
-    NETWORK_PATH,
-    num_clusters,
-)
-num_zones = {
-    "load": load_base.shape[1],
-    "solar": len(area_mapping_solar.area_id.unique()),
-    "wind": len(area_mapping_wind.area_id.unique()),
+def truncated_resample_ratio(
+    original_ratio,
+    sigma,
+    thresholds,
+    original_epsilon,
+    rng,
+):
+    """
+    Redraws out of bounds epsilon from the truncated normal keeping the ratio
+    in [0, thresholds].
+
+    Conditioning N(0, sigma) on the ratio landing in bounds is exactly the
+    distribution the rejection loop in resample_ratio converges to, so both
+    methods sample the same process. All values are redrawn in a single step.
+
+    Args:
+        original_ratio (numpy.ndarray): Sampled ratio.
+        sigma (numpy.ndarray): Sigma for each sampling id.
+        thresholds (numpy.ndarray): Thresholds for the ratio sample.
+        original_epsilon (numpy.ndarray): Epsilon used for the sampled ratio.
+        rng (numpy.random.Generator): Random number generator.
+
+    Returns:
+        numpy.ndarray: Resampled ratio.
+        numpy.ndarray: Resampled epsilon.
+        int: Number of resampling steps performed.
+    """
+    mask_to_resample = (original_ratio > thresholds) | (original_ratio < 0)
+    if not mask_to_resample.any():
+        return original_ratio, original_epsilon, 0
+
+    ratio = original_ratio.copy()
+    epsilon = original_epsilon.copy()
+    scale = sigma[mask_to_resample]
+    if (scale <= 0).any():
+        raise ValueError("Cannot resample ratio with non-positive sigma")
+
+    # ratio without its innovation; the new epsilon must land it in bounds
+    base = ratio[mask_to_resample] - epsilon[mask_to_resample]
+    upper_bound = thresholds[mask_to_resample] if np.ndim(thresholds) else thresholds
+    lower, upper = (0 - base) / scale, (upper_bound - base) / scale
+
+    # inverse cdf sampling, mirrored into the lower tail and in log space, so
+    # that it stays accurate for intervals deep in either tail where the cdf
+    # of both bounds would round to the same value
+    flip = lower > 0
+    lower, upper = np.where(flip, -upper, lower), np.where(flip, -lower, upper)
+    log_cdf_lower, log_cdf_upper = log_ndtr(lower), log_ndtr(upper)
+    u = rng.uniform(size=len(lower))
+    cdf_share = u + (1 - u) * np.exp(log_cdf_lower - log_cdf_upper)
+    log_cdf = log_cdf_upper + np.log(np.maximum(cdf_share, TINY))
+    # np.minimum/np.maximum, np.clip has a large overhead on these small arrays
+    z = np.minimum(np.maximum(ndtri_exp(log_cdf), lower), upper)
+    resampled_epsilon = np.where(flip, -z, z) * scale
+
+    resampled_ratio = np.minimum(np.maximum(base + resampled_epsilon, 0), upper_bound)
+    ratio[mask_to_resample] = resampled_ratio
+    epsilon[mask_to_resample] = resampled_epsilon
+    return ratio, epsilon, 1
+
+
+def rng_eps(sigma, rng):
+    return rng.standard_normal(len(sigma)) * sigma
+
+
+RESAMPLE_METHODS = {
+    "truncated": truncated_resample_ratio,
+    "rejection": resample_ratio,
 }
 
-Path("sampled_data").mkdir(parents=True, exist_ok=True)
-PATH_SAMPLE = Path("sampled_data")
-num_hours = load_base.shape[0]
-
-solar_parameters = solar_parameters[
-    solar_parameters.area_id.isin(area_mapping_solar.area_id.unique())
-]
-wind_parameters = wind_parameters[
-    wind_parameters.area_id.isin(area_mapping_wind.area_id.unique())
-]
-
-# Define Sampling IDs
-load_parameters["sampling_id"] = (
-    load_parameters.index
-    + "_"
-    + load_parameters.timescale
-    + "_"
-    + load_parameters.area_id.astype(str)
-)
-solar_parameters["sampling_id"] = (
-    solar_parameters.index
-    + "_"
-    + solar_parameters.timescale
-    + "_"
-    + solar_parameters.area_id.astype(str)
-)
-wind_parameters["sampling_id"] = (
-    wind_parameters.index
-    + "_"
-    + wind_parameters.timescale
-    + "_"
-    + wind_parameters.area_id.astype(str)
-)
-parameters_concat = pd.concat(
-    [load_parameters, solar_parameters, wind_parameters],
-).reset_index()
-
-# Create a timeseries index dataframe to reference when sampling
-timestamp_reference = pd.DataFrame(
-    {"timestamp": pd.period_range(year, periods=num_hours, freq="h")},
-)
-timestamp_reference = timestamp_reference.assign(
-    month=timestamp_reference["timestamp"].dt.month,
-    day=timestamp_reference["timestamp"].dt.day,
-    hour=timestamp_reference["timestamp"].dt.hour,
-    day_of_year=timestamp_reference["timestamp"].dt.dayofyear,
-)
-timestamp_reference["season"] = timestamp_reference["month"].map(
-    {
-        12: "winter",
-        1: "winter",
-        2: "winter",
-        3: "spring",
-        4: "spring",
-        5: "spring",
-        6: "summer",
-        7: "summer",
-        8: "summer",
-        9: "fall",
-        10: "fall",
-        11: "fall",
-    },
-)
-timestamp_reference["season_num"] = timestamp_reference["season"].map(
-    {"winter": 1, "spring": 2, "summer": 3, "fall": 4},
-)
-
-load_base.reset_index(inplace=True, drop=True)
-solar_base.reset_index(inplace=True, drop=True)
-wind_base.reset_index(inplace=True, drop=True)
-
-# resample load, solar, and wind to daily and area level values.
-solar_base_area_daily, solar_base_area = resample_and_group(
-    solar_base,
-    area_mapping_solar,
-)
-wind_base_area_daily, wind_base_area = resample_and_group(wind_base, area_mapping_wind)
-
-# %% #Create Generation-Plant Allocations to Map from Area Stochastic Profiles to Plant level Profiles.
-solar_allocation = create_allocation(solar_base, area_mapping_solar)
-wind_allocation = create_allocation(wind_base, area_mapping_wind)
-
-# %% #Define Solar Hours
-daytime_mask = solar_base_area >= 0.0001
-daytime_mask = daytime_mask.apply(lambda x: x.astype(int))
-df_daytime_solar_tracking = pd.DataFrame(
-    np.zeros_like(solar_base_area),
-    index=solar_base_area.index,
-    columns=solar_base_area.columns,
-)
-df_daytime_solar_tracking = df_daytime_solar_tracking.apply(
-    lambda x: define_solar_hours(daytime_mask[x.name], timestamp_reference)[2],
-)
-
-# %%#Define Stochastic Mu Dataframes
-cols_to_use = timestamp_reference.columns.difference(load_parameters.columns)
-df_mu_load_hourly_unstack = assign_stochastic_mu(
-    load_parameters.reset_index(),
-    timestamp_reference[cols_to_use],
-)
-df_mu_solar_hourly_unstack = assign_stochastic_mu(
-    solar_parameters.query("timescale == 'hourly'").reset_index(),
-    timestamp_reference[cols_to_use],
-)
-df_mu_solar_daily_unstack = assign_stochastic_mu(
-    solar_parameters.query(" timescale == 'daily' ").reset_index(),
-    timestamp_reference,
-)
-df_mu_wind_hourly_unstack = assign_stochastic_mu(
-    wind_parameters.query(" timescale == 'daily' ").reset_index(),
-    timestamp_reference[cols_to_use],
-)
-df_mu_wind_daily_unstack = assign_stochastic_mu(
-    wind_parameters.query(" timescale == 'daily' ").reset_index(),
-    timestamp_reference[cols_to_use],
-)
-
-# %% Create Output NP Arrays
-load_zones_samples = np.zeros([num_hours, num_zones["load"], num_samples])
-solar_zones_samples = np.zeros([num_hours, num_zones["solar"], num_samples])
-wind_zones_samples = np.zeros([num_hours, num_zones["wind"], num_samples])
-solar_gen_samples = np.zeros([num_hours, solar_base.columns.shape[0], num_samples])
-wind_gen_samples = np.zeros([num_hours, wind_base.columns.shape[0], num_samples])
-ratio_samples_combined = np.zeros(
-    [num_hours, parameters_concat.sampling_id.unique().shape[0], num_samples],
-)
-
-# %% Sampling Process
-for sample_num in range(0, num_samples):
-    print(f"Sample {sample_num}")
-    rng = np.random.default_rng(seed=sample_num)
-    start_time = time.time()
-    resample_count = 0
-    n_hours = timestamp_reference.shape[0]
-    sampling_profile_names = parameters_concat.sampling_id.unique()
-    solar_sampling_id_dict = dict(
-        parameters_concat[parameters_concat.sampling_id.str.contains("solar")]
-        .reset_index()[["sampling_id", "index"]]
-        .values,
-    )
-    ratio_samples = pd.DataFrame(
-        0,
-        index=np.arange(n_hours),
-        columns=sampling_profile_names,
+
+def _sample_worker(arrays, resample_method, seed_sequence):
+    rng = np.random.default_rng(seed_sequence)
+    ratio, _ = sample_ratios(arrays, rng, resample_method=resample_method)
+    return ratio
+
+
+def generate_ratio_samples(
+    arrays,
+    num_samples,
+    seed=0,
+    num_workers=1,
+    resample_method="truncated",
+):
+    """
+    Generates ratio samples in parallel, yielding them in sample order.
+
+    Every sample draws from its own child stream spawned from one root
+    SeedSequence, so the output only depends on the seed and not on the
+    number of workers. At most two samples per worker are kept in flight.
+
+    Args:
+        arrays (dict): Sampler arrays created by build_sampler_arrays.
+        num_samples (int): Number of samples to generate.
+        seed (int): Root seed of the ensemble.
+        num_workers (int): Number of worker processes. Runs serially if 1.
+        resample_method (str): "truncated" or "rejection", see RESAMPLE_METHODS.
+
+    Yields:
+        int: Sample number.
+        numpy.ndarray: Sampled ratios of shape (hours, sampling ids).
+    """
+    seed_sequences = np.random.SeedSequence(seed).spawn(num_samples)
+    worker = partial(_sample_worker, arrays, resample_method)
+
+    if num_workers <= 1:
+        for sample_num, seed_sequence in enumerate(seed_sequences):
+            yield sample_num, worker(seed_sequence)
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        pending = deque()
+        for sample_num, seed_sequence in enumerate(seed_sequences):
+            pending.append(executor.submit(worker, seed_sequence))
+            if len(pending) >= 2 * num_workers:
+                yield sample_num - len(pending) + 1, pending.popleft().result()
+        while pending:
+            yield num_samples - len(pending), pending.popleft().result()
+
+
+class SampleWriter:
+    """
+    Streams samples to a chunked and compressed netCDF file.
+
+    Each finished sample is appended along the unlimited sample_num
+    dimension, so memory use does not grow with the number of samples. The
+    file can be read back with xarray.open_dataarray.
+
+    Args:
+        path (str): Path of the netCDF file.
+        name (str): Name of the sampled variable.
+        timestamps (pandas.DatetimeIndex): Timestamps of the samples.
+        coords (dict): Names and values of the dimensions between timestamp and sample_num.
+        dtype (str): Data type the samples are stored as.
+        complevel (int): zlib compression level.
+        time_chunk (int): Number of hours per chunk.
+    """
+
+    def __init__(
+        self,
+        path,
+        name,
+        timestamps,
+        coords,
+        dtype="float32",
+        complevel=4,
+        time_chunk=744,
+    ):
+        import netCDF4
+
+        self.dtype = np.dtype(dtype)
+        self.ds = netCDF4.Dataset(path, "w")
+
+        timestamps = pd.DatetimeIndex(timestamps)
+        self.ds.createDimension("timestamp", len(timestamps))
+        time_var = self.ds.createVariable("timestamp", "i8", ("timestamp",))
+        time_var.units = f"hours since {timestamps[0]:%Y-%m-%d %H:%M:%S}"
+        time_var.calendar = "proleptic_gregorian"
+        time_var[:] = (timestamps - timestamps[0]) // pd.Timedelta(hours=1)
+
+        for dim, values in coords.items():
+            values = np.asarray(values)
+            self.ds.createDimension(dim, len(values))
+            if values.dtype.kind in "OU":
+                self.ds.createVariable(dim, str, (dim,))[:] = values.astype(str)
+            else:
+                self.ds.createVariable(dim, values.dtype, (dim,))[:] = values
+
+        self.ds.createDimension("sample_num", None)
+        self.sample_num = self.ds.createVariable("sample_num", "i4", ("sample_num",))
+        chunksizes = [min(time_chunk, len(timestamps))]
+        chunksizes += [len(values) for values in coords.values()] + [1]
+        self.data = self.ds.createVariable(
+            name,
+            self.dtype,
+            ("timestamp", *coords, "sample_num"),
+            zlib=True,
+            complevel=complevel,
+            chunksizes=[max(size, 1) for size in chunksizes],
+        )
+
+    def append(self, sample_num, data):
+        """
+        Writes one sample of shape (timestamp, *coords) to the file.
+        """
+        self.data[..., sample_num] = np.asarray(data, dtype=self.dtype)
+        self.sample_num[sample_num] = sample_num
+        self.ds.sync()
+
+    def close(self):
+        self.ds.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    ################### Import Parameters ###################
+    area_mapping_solar = pd.read_csv(
+        "parameters/pypsa_area_mapping_solar.csv",
+        index_col=0,
     )
-    epsilon_samples = pd.DataFrame(
-        0,
-        index=np.arange(n_hours),
-        columns=sampling_profile_names,
+    area_mapping_wind = pd.read_csv(
+        "parameters/pypsa_area_mapping_wind.csv",
+        index_col=0,
+    )
+    load_parameters = pd.read_csv("parameters/pypsa_load_parameters.csv", index_col=0)
+    solar_parameters = pd.read_csv("parameters/pypsa_solar_parameters.csv", index_col=0)
+    wind_parameters = pd.read_csv("parameters/pypsa_wind_parameters.csv", index_col=0)
+
+    ################### Parameters ###################
+    num_samples = 10
+    load_ratio_threshold = 5
+    solar_ratio_threshold = 5
+    wind_ratio_threshold = 100000
+    resample_method = "truncated"  # "rejection" reproduces the original retry loop
+    seed = 0
+    num_workers = os.cpu_count()
+    sample_dtype = "float32"
+    year = 2016
+    NETWORK_PATH = "/Users/kamrantehranchi/Local_Documents/pypsa-breakthroughenergy-usa/workflow/notebooks/elec_s_96_offwind_2.nc"
+    num_clusters = 96
+
+    ################### Sampling ###################
+    # %%
+    load_base, solar_base, wind_base = import_profiles_from_network(
+        NETWORK_PATH,
+        num_clusters,
     )
 
-    thresholds = np.concatenate(
-        [
-            [load_ratio_threshold] * ratio_samples.columns.str.contains("load").sum(),
-            [solar_ratio_threshold] * ratio_samples.columns.str.contains("solar").sum(),
-            [wind_ratio_threshold] * ratio_samples.columns.str.contains("wind").sum(),
-        ],
+    Path("sampled_data").mkdir(parents=True, exist_ok=True)
+    PATH_SAMPLE = Path("sampled_data")
+    num_hours = load_base.shape[0]
+
+    solar_parameters = solar_parameters[
+        solar_parameters.area_id.isin(area_mapping_solar.area_id.unique())
+    ]
+    wind_parameters = wind_parameters[
+        wind_parameters.area_id.isin(area_mapping_wind.area_id.unique())
+    ]
+
+    # Define Sampling IDs
+    load_parameters["sampling_id"] = (
+        load_parameters.index
+        + "_"
+        + load_parameters.timescale
+        + "_"
+        + load_parameters.area_id.astype(str)
     )
+    solar_parameters["sampling_id"] = (
+        solar_parameters.index
+        + "_"
+        + solar_parameters.timescale
+        + "_"
+        + solar_parameters.area_id.astype(str)
+    )
+    wind_parameters["sampling_id"] = (
+        wind_parameters.index
+        + "_"
+        + wind_parameters.timescale
+        + "_"
+        + wind_parameters.area_id.astype(str)
+    )
+    parameters_concat = pd.concat(
+        [load_parameters, solar_parameters, wind_parameters],
+    ).reset_index()
 
-    ratio_samples.iloc[0, :], epsilon_samples.iloc[0, :] = sampling_warmup(
-        parameters_concat,
-        thresholds,
-        rng,
+    # Create a timeseries index dataframe to reference when sampling
+    timestamp_reference = pd.DataFrame(
+        {"timestamp": pd.period_range(year, periods=num_hours, freq="h")},
+    )
+    timestamp_reference = timestamp_reference.assign(
+        month=timestamp_reference["timestamp"].dt.month,
+        day=timestamp_reference["timestamp"].dt.day,
+        hour=timestamp_reference["timestamp"].dt.hour,
+        day_of_year=timestamp_reference["timestamp"].dt.dayofyear,
+    )
+    timestamp_reference["season"] = timestamp_reference["month"].map(
+        {
+            12: "winter",
+            1: "winter",
+            2: "winter",
+            3: "spring",
+            4: "spring",
+            5: "spring",
+            6: "summer",
+            7: "summer",
+            8: "summer",
+            9: "fall",
+            10: "fall",
+            11: "fall",
+        },
+    )
+    timestamp_reference["season_num"] = timestamp_reference["season"].map(
+        {"winter": 1, "spring": 2, "summer": 3, "fall": 4},
     )
 
-    for i in range(1, n_hours):
+    load_base.reset_index(inplace=True, drop=True)
+    solar_base.reset_index(inplace=True, drop=True)
+    wind_base.reset_index(inplace=True, drop=True)
 
-        season_df = parameters_concat[
-            parameters_concat.season == timestamp_reference.iloc[i].season_num
-        ]
-        p_eps = rng_eps(season_df, rng)
-        ratio_samples.iloc[i, :] = (
-            ratio_samples.iloc[i - 1, :]
-            + season_df.kai.values
-            * (season_df.mu.values - ratio_samples.iloc[i - 1, :])
-            + p_eps.values
-        )
-        epsilon_samples.iloc[i, :] = p_eps.values
+    # resample load, solar, and wind to daily and area level values.
+    solar_base_area_daily, solar_base_area = resample_and_group(
+        solar_base,
+        area_mapping_solar,
+    )
+    wind_base_area_daily, wind_base_area = resample_and_group(
+        wind_base, area_mapping_wind
+    )
 
-        if i % 24 != 0:
-            ratio_samples.loc[i, ratio_samples.columns.str.contains("daily")] = (
-                ratio_samples.loc[i - 1, ratio_samples.columns.str.contains("daily")]
-            )
-            epsilon_samples.loc[i, epsilon_samples.columns.str.contains("daily")] = (
-                epsilon_samples.loc[
-                    i - 1,
-                    epsilon_samples.columns.str.contains("daily"),
-                ]
-            )
+    # %% #Create Generation-Plant Allocations to Map from Area Stochastic Profiles to Plant level Profiles.
+    solar_allocation = AreaAllocation(solar_base, area_mapping_solar)
+    wind_allocation = AreaAllocation(wind_base, area_mapping_wind)
 
-        previous_sunset_idx = df_daytime_solar_tracking.iloc[i].astype(int)
-        if (previous_sunset_idx > 0).any():
-            area_sunset_dict = dict(
-                zip(
-                    [
-                        solar_sampling_id_dict.get(param_code)
-                        for param_code in ratio_samples.columns
-                        if "solar" in param_code
-                    ],
-                    previous_sunset_idx[previous_sunset_idx > 0].index,
-                ),
-            )
-            previous_mu_vals = ratio_samples.loc[
-                :,
-                ratio_samples.columns.str.contains("solar"),
-            ].iloc[i - 1]
-            # previous_mu_vals = ratio_samples.loc[:,ratio_samples.columns.str.contains('solar')].iloc[i - 1].rename(index=solar_sampling_id_dict).loc[area_sunset_dict.keys()]
-            solar_season = season_df[season_df.sampling_id.str.contains("solar")]
-            solar_mu_vals, solar_kai_vals = solar_season[["mu", "kai"]][
-                solar_season.sampling_id.isin(previous_mu_vals.index)
-            ].values.T
-            eps_filtered = (
-                p_eps[solar_season.index]
-                .rename(index=season_df.sampling_id.to_dict())
-                .loc[previous_mu_vals.index]
-                .values
-            )
-            ratio_samples.loc[i, previous_mu_vals.index] = (
-                previous_mu_vals.values
-                + solar_kai_vals * (solar_mu_vals - previous_mu_vals.values)
-                + eps_filtered
-            )
+    # %% #Define Solar Hours
+    daytime_mask = solar_base_area >= 0.0001
+    df_daytime_solar_tracking = pd.DataFrame(
+        define_solar_hours(daytime_mask)[2],
+        index=solar_base_area.index,
+        columns=solar_base_area.columns,
+    )
 
-        if (ratio_samples.iloc[i] > thresholds).any() or (
-            ratio_samples.iloc[i] < 0
-        ).any():
-            r0, eps = ratio_samples.iloc[i], epsilon_samples.iloc[i, :]
-            ratios_new, eps_new, resample_count = resample_ratio(
-                r0,
-                season_df,
-                thresholds,
-                eps,
-                rng,
-                False,
-            )
-            ratio_samples.iloc[i], epsilon_samples.iloc[i, :], resample_count = (
-                ratios_new,
-                eps_new,
-                resample_count,
-            )
-    print(f"Sampling time : {time.time() - start_time}")
+    # %%#Define Stochastic Mu Dataframes
+    cols_to_use = timestamp_reference.columns.difference(load_parameters.columns)
+    df_mu_load_hourly_unstack = assign_stochastic_mu(
+        load_parameters.reset_index(),
+        timestamp_reference[cols_to_use],
+    )
+    df_mu_solar_hourly_unstack = assign_stochastic_mu(
+        solar_parameters.query("timescale == 'hourly'").reset_index(),
+        timestamp_reference[cols_to_use],
+    )
+    df_mu_solar_daily_unstack = assign_stochastic_mu(
+        solar_parameters.query(" timescale == 'daily' ").reset_index(),
+        timestamp_reference,
+    )
+    df_mu_wind_hourly_unstack = assign_stochastic_mu(
+        wind_parameters.query(" timescale == 'daily' ").reset_index(),
+        timestamp_reference[cols_to_use],
+    )
+    df_mu_wind_daily_unstack = assign_stochastic_mu(
+        wind_parameters.query(" timescale == 'daily' ").reset_index(),
+        timestamp_reference[cols_to_use],
+    )
 
-    ratio_samples_combined[:, :, sample_num] = ratio_samples.values
-
-    # Load Calculation
-    sampled_load_ratio = ratio_samples.filter(like="load")
-    sampled_load = (
-        load_base
-        * sampled_load_ratio.values
-        / df_mu_load_hourly_unstack.iloc[:, 1:].values
-    )
-    sampled_load["timestamp"] = timestamp_reference.timestamp
-    sampled_load.set_index("timestamp", inplace=True)
-    sampled_load.columns = load_base.columns
-    load_zones_samples[:, :, sample_num] = sampled_load.values
-
-    # Solar Calculation
-    sampled_hourly_solar_ratio = ratio_samples.filter(regex="solar.*hourly")
-    sampled_daily_solar_ratio = ratio_samples.filter(regex="solar.*daily")
-    sampled_solar = (
-        solar_base_area.values
-        * (
-            0.333 * sampled_hourly_solar_ratio.values
-            + 0.667 * sampled_daily_solar_ratio.values
-        )
-        / (
-            df_mu_solar_hourly_unstack.iloc[:, 1:] * 0.333
-            + df_mu_solar_daily_unstack.iloc[:, 1:] * 0.667
-        )
+    # %% Match headers across datasets to combine them into bus and zone arrays
+    solar_cols = area_mapping_solar.drop("area_id", axis=1)
+    wind_cols = area_mapping_wind.drop("area_id", axis=1)
+    # remove words solar/wind/offwind from values in index to match column headers from load data. Used to match buses with eachother
+    solar_cols.index = solar_cols.index.str.replace(" solar", "")
+    wind_cols.index = wind_cols.index.str.replace(" wind", "")
+    wind_cols.index = wind_cols.index.str.replace(" offwind", "")
+
+    solar_cols["np_ind_solar"] = np.arange(0, len(solar_cols))
+    wind_cols["np_ind_wind"] = np.arange(0, len(wind_cols))
+    df_ind_match = pd.DataFrame(load_base.columns, columns=["load"])
+    df_ind_match["np_ind_load"] = np.arange(0, len(load_base.columns))
+    df_ind_match = df_ind_match.merge(
+        solar_cols,
+        left_on="load",
+        right_index=True,
+        how="outer",
+    ).merge(wind_cols, left_on="load", right_index=True, how="outer")
+    df_ind_match.index = np.arange(0, len(df_ind_match))
+    df_bus_coordinates = df_ind_match["load"]
+    df_ind_match = df_ind_match.drop(columns=["load"])
+    df_ind_match_combinedarr = df_ind_match.where(
+        df_ind_match.isnull(),
+        np.column_stack([df_ind_match.index.values] * 3),
     )
-    sampled_solar[sampled_solar > 1] = 1  # capacity factor cannot be greater than 1
 
-    sampled_solar_generatorlvl = (
-        np.ones_like(solar_base.values) * solar_allocation.values
+    # Create index references for each dataset
+    solar_inds_combined = df_ind_match_combinedarr.np_ind_solar.values[
+        ~np.isnan(df_ind_match_combinedarr.np_ind_solar.values)
+    ].astype(int)
+    wind_inds_combined = df_ind_match_combinedarr.np_ind_wind.values[
+        ~np.isnan(df_ind_match_combinedarr.np_ind_wind.values)
+    ].astype(int)
+    load_inds_combined = df_ind_match_combinedarr.np_ind_load.values[
+        ~np.isnan(df_ind_match_combinedarr.np_ind_load.values)
+    ].astype(int)
+
+    wind_inds_orig = df_ind_match.np_ind_wind.dropna().astype(int).values
+    solar_inds_orig = df_ind_match.np_ind_solar.dropna().astype(int).values
+    load_inds_orig = df_ind_match.np_ind_load.dropna().astype(int).values
+
+    ################Combining zonal data into one array for each profile type #############################
+    # remove numeric from wind and solar columns
+    base_zones_solar = pd.DataFrame(
+        solar_cols.index.str.replace("[0-9]", "").drop_duplicates(),
+        columns=["solar"],
     )
-    sampled_solar_generatorlvl = pd.DataFrame(
-        sampled_solar_generatorlvl,
-        index=sampled_solar.index,
-        columns=solar_allocation.columns,
+    base_zones_wind = pd.DataFrame(
+        wind_cols.index.str.replace("[0-9]", "").drop_duplicates(),
+        columns=["wind"],
     )
-    sampled_solar_generatorlvl = sampled_solar_generatorlvl.apply(
-        lambda x: x * sampled_solar.loc[:, str(x.name)],
-        axis=0,
+
+    base_zones_wind = base_zones_wind[
+        ~base_zones_wind.wind.str.contains("SDGE")
+    ].reset_index(
+        drop=True,
+    )  # temporary fix
+    df_zone_ind_match = base_zones_solar.reset_index(names="solar_ind").merge(
+        base_zones_wind.reset_index(names="wind_ind"),
+        left_on="solar",
+        right_on="wind",
+        how="outer",
     )
+    # combine non nan values into new column
+    zone_coords = df_zone_ind_match.solar.combine_first(df_zone_ind_match.wind)
+    solar_zone_inds_combined = df_zone_ind_match.solar_ind.values[
+        ~np.isnan(df_zone_ind_match.solar_ind.values)
+    ].astype(int)
+    wind_zone_inds_combined = df_zone_ind_match.wind_ind.values[
+        ~np.isnan(df_zone_ind_match.wind_ind.values)
+    ].astype(int)
+    wind_zone_inds_orig = df_zone_ind_match.wind_ind.dropna().astype(int).values
+    solar_zone_inds_orig = df_zone_ind_match.solar_ind.dropna().astype(int).values
+
+    # %% Sampling Process
+    sampling_profile_names = pd.Index(parameters_concat.sampling_id.unique())
+    thresholds = np.select(
+        [
+            sampling_profile_names.str.contains("load"),
+            sampling_profile_names.str.contains("solar"),
+            sampling_profile_names.str.contains("wind"),
+        ],
+        [load_ratio_threshold, solar_ratio_threshold, wind_ratio_threshold],
+    )
+    sampler_arrays = build_sampler_arrays(
+        parameters_concat,
+        timestamp_reference,
+        df_daytime_solar_tracking,
+        thresholds,
+    )
+    timestamps = timestamp_reference.timestamp.dt.to_timestamp()
 
-    solar_zones_samples[:, :, sample_num] = sampled_solar.values
-    solar_gen_samples[:, :, sample_num] = sampled_solar_generatorlvl.values
+    start_time = time.time()
+    with SampleWriter(
+        PATH_SAMPLE / "sampled_bus_data.nc",
+        "bus_data",
+        timestamps,
+        {"bus": df_bus_coordinates.values, "profile_type": ["load", "solar", "wind"]},
+        dtype=sample_dtype,
+    ) as bus_writer, SampleWriter(
+        PATH_SAMPLE / "sampled_zone_data.nc",
+        "zone_data",
+        timestamps,
+        {"zone": zone_coords.values, "profile_type": ["solar", "wind"]},
+        dtype=sample_dtype,
+    ) as zone_writer, SampleWriter(
+        PATH_SAMPLE / "sampled_ratio_data.nc",
+        "ratio",
+        timestamps,
+        {"ratio_sample": sampling_profile_names.values},
+        dtype=sample_dtype,
+    ) as ratio_writer, SampleWriter(
+        PATH_SAMPLE / "sampled_generator_data.nc",
+        "p_max_pu",
+        timestamps,
+        {"generator": solar_base.columns.append(wind_base.columns).values},
+        dtype=sample_dtype,
+    ) as generator_writer:
+        for sample_num, ratio_values in generate_ratio_samples(
+            sampler_arrays,
+            num_samples,
+            seed=seed,
+            num_workers=num_workers,
+            resample_method=resample_method,
+        ):
+            print(f"Sample {sample_num}")
+            ratio_samples = pd.DataFrame(ratio_values, columns=sampling_profile_names)
+            ratio_writer.append(sample_num, ratio_values)
+
+            # Load Calculation
+            sampled_load_ratio = ratio_samples.filter(like="load")
+            sampled_load = (
+                load_base
+                * sampled_load_ratio.values
+                / df_mu_load_hourly_unstack.iloc[:, 1:].values
+            )
+            sampled_load["timestamp"] = timestamp_reference.timestamp
+            sampled_load.set_index("timestamp", inplace=True)
+            sampled_load.columns = load_base.columns
+
+            # Solar Calculation
+            sampled_hourly_solar_ratio = ratio_samples.filter(regex="solar.*hourly")
+            sampled_daily_solar_ratio = ratio_samples.filter(regex="solar.*daily")
+            sampled_solar = (
+                solar_base_area.values
+                * (
+                    0.333 * sampled_hourly_solar_ratio.values
+                    + 0.667 * sampled_daily_solar_ratio.values
+                )
+                / (
+                    df_mu_solar_hourly_unstack.iloc[:, 1:] * 0.333
+                    + df_mu_solar_daily_unstack.iloc[:, 1:] * 0.667
+                )
+            )
+            # capacity factor cannot be greater than 1
+            sampled_solar[sampled_solar > 1] = 1
+
+            sampled_solar_generatorlvl = solar_allocation.downscale(sampled_solar)
+
+            # Wind Calculation
+            sampled_hourly_wind_ratio = ratio_samples.filter(regex="wind.*hourly")
+            sampled_daily_wind_ratio = ratio_samples.filter(regex="wind.*daily")
+            sampled_wind = (
+                wind_base_area.values
+                * (
+                    0.333 * sampled_hourly_wind_ratio.values
+                    + 0.667 * sampled_daily_wind_ratio.values
+                )
+                / (
+                    df_mu_wind_hourly_unstack.iloc[:, 1:] * 0.333
+                    + df_mu_wind_daily_unstack.iloc[:, 1:] * 0.667
+                )
+            )
+            # capacity factor cannot be greater than 1
+            sampled_wind[sampled_wind > 1] = 1
 
-    # Wind Calculation
-    sampled_hourly_wind_ratio = ratio_samples.filter(regex="wind.*hourly")
-    sampled_daily_wind_ratio = ratio_samples.filter(regex="wind.*daily")
-    sampled_wind = (
-        wind_base_area.values
-        * (
-            0.333 * sampled_hourly_wind_ratio.values
-            + 0.667 * sampled_daily_wind_ratio.values
-        )
-        / (
-            df_mu_wind_hourly_unstack.iloc[:, 1:] * 0.333
-            + df_mu_wind_daily_unstack.iloc[:, 1:] * 0.667
-        )
-    )
-    sampled_wind[sampled_wind > 1] = 1  # capacity factor cannot be greater than 1
-
-    sampled_wind_generatorlvl = np.ones_like(wind_base.values) * wind_allocation.values
-    sampled_wind_generatorlvl = pd.DataFrame(
-        sampled_wind_generatorlvl,
-        index=sampled_wind.index,
-        columns=wind_allocation.columns,
-    )
-    sampled_wind_generatorlvl = sampled_wind_generatorlvl.apply(
-        lambda x: x * sampled_wind.loc[:, str(x.name)],
-        axis=0,
-    )
-
-    wind_zones_samples[:, :, sample_num] = sampled_wind.values
-    wind_gen_samples[:, :, sample_num] = sampled_wind_generatorlvl.values
-
-# %% Combining into Xarray Dataset
-# Match headers across datasets
-solar_cols = area_mapping_solar.drop("area_id", axis=1)
-wind_cols = area_mapping_wind.drop("area_id", axis=1)
-# remove words solar/wind/offwind from values in index to match column headers from load data. Used to match buses with eachother
-solar_cols.index = solar_cols.index.str.replace(" solar", "")
-wind_cols.index = wind_cols.index.str.replace(" wind", "")
-wind_cols.index = wind_cols.index.str.replace(" offwind", "")
-
-solar_cols["np_ind_solar"] = np.arange(0, len(solar_cols))
-wind_cols["np_ind_wind"] = np.arange(0, len(wind_cols))
-df_ind_match = pd.DataFrame(load_base.columns, columns=["load"])
-df_ind_match["np_ind_load"] = np.arange(0, len(load_base.columns))
-df_ind_match = df_ind_match.merge(
-    solar_cols,
-    left_on="load",
-    right_index=True,
-    how="outer",
-).merge(wind_cols, left_on="load", right_index=True, how="outer")
-df_ind_match.index = np.arange(0, len(df_ind_match))
-df_bus_coordinates = df_ind_match["load"]
-df_ind_match = df_ind_match.drop(columns=["load"])
-df_ind_match_combinedarr = df_ind_match.where(
-    df_ind_match.isnull(),
-    np.column_stack([df_ind_match.index.values] * 3),
-)
-
-# Create index references for each dataset
-solar_inds_combined = df_ind_match_combinedarr.np_ind_solar.values[
-    ~np.isnan(df_ind_match_combinedarr.np_ind_solar.values)
-].astype(int)
-wind_inds_combined = df_ind_match_combinedarr.np_ind_wind.values[
-    ~np.isnan(df_ind_match_combinedarr.np_ind_wind.values)
-].astype(int)
-load_inds_combined = df_ind_match_combinedarr.np_ind_load.values[
-    ~np.isnan(df_ind_match_combinedarr.np_ind_load.values)
-].astype(int)
-
-wind_inds_orig = df_ind_match.np_ind_wind.dropna().astype(int).values
-solar_inds_orig = df_ind_match.np_ind_solar.dropna().astype(int).values
-load_inds_orig = df_ind_match.np_ind_load.dropna().astype(int).values
-
-# Combine load solar wind data into one array for each sample
-combined_gen_samples = np.zeros(
-    [8784, 97, 3, num_samples],
-)  # Dimensions are (t, node, profile type, samples)
-combined_gen_samples[:, load_inds_combined, 0, :] = load_zones_samples[
-    :,
-    load_inds_orig,
-    :,
-]
-combined_gen_samples[:, solar_inds_combined, 1, :] = solar_gen_samples[
-    :,
-    solar_inds_orig,
-    :,
-]
-combined_gen_samples[:, wind_inds_combined, 2, :] = wind_gen_samples[
-    :,
-    wind_inds_orig,
-    :,
-]
-
-# Create xarray dataset
-da_bus_data = xr.DataArray(
-    combined_gen_samples,
-    coords={
-        "timestamp": timestamp_reference.timestamp.dt.to_timestamp(),
-        "bus": df_bus_coordinates.values,
-        "profile_type": ["load", "solar", "wind"],
-        "sample_num": np.arange(0, num_samples),
-    },
-    dims=["timestamp", "bus", "profile_type", "sample_num"],
-)
-
-################Combining zonal data into one array for each profile type #############################
-# remove numeric from wind and solar columns
-base_zones_solar = pd.DataFrame(
-    solar_cols.index.str.replace("[0-9]", "").drop_duplicates(),
-    columns=["solar"],
-)
-base_zones_wind = pd.DataFrame(
-    wind_cols.index.str.replace("[0-9]", "").drop_duplicates(),
-    columns=["wind"],
-)
-
-base_zones_wind = base_zones_wind[
-    ~base_zones_wind.wind.str.contains("SDGE")
-].reset_index(
-    drop=True,
-)  # temporary fix
-df_zone_ind_match = base_zones_solar.reset_index(names="solar_ind").merge(
-    base_zones_wind.reset_index(names="wind_ind"),
-    left_on="solar",
-    right_on="wind",
-    how="outer",
-)
-# combine non nan values into new column
-zone_coords = df_zone_ind_match.solar.combine_first(df_zone_ind_match.wind)
-solar_zone_inds_combined = df_zone_ind_match.solar_ind.values[
-    ~np.isnan(df_zone_ind_match.solar_ind.values)
-].astype(int)
-wind_zone_inds_combined = df_zone_ind_match.wind_ind.values[
-    ~np.isnan(df_zone_ind_match.wind_ind.values)
-].astype(int)
-wind_zone_inds_orig = df_zone_ind_match.wind_ind.dropna().astype(int).values
-solar_zone_inds_orig = df_zone_ind_match.solar_ind.dropna().astype(int).values
-
-combined_zone_data = np.zeros(
-    [8784, 22, 2, num_samples],
-)  # Dimensions are (t, node, profile type, samples)
-combined_zone_data[:, solar_zone_inds_combined, 0, :] = solar_zones_samples[
-    :,
-    solar_zone_inds_orig,
-    :,
-]
-combined_zone_data[:, wind_zone_inds_combined, 1, :] = wind_zones_samples[
-    :,
-    wind_zone_inds_orig,
-    :,
-]
-
-da_zone_data = xr.DataArray(
-    combined_zone_data,
-    coords={
-        "timestamp": timestamp_reference.timestamp.dt.to_timestamp(),
-        "zone": zone_coords.values,
-        "profile_type": ["solar", "wind"],
-        "sample_num": np.arange(0, num_samples),
-    },
-    dims=["timestamp", "zone", "profile_type", "sample_num"],
-)
-
-da_ratios = xr.DataArray(
-    ratio_samples_combined,
-    coords={
-        "timestamp": timestamp_reference.timestamp.dt.to_timestamp(),
-        "ratio_sample": parameters_concat.sampling_id.unique(),
-        "sample_num": np.arange(0, num_samples),
-    },
-    dims=["timestamp", "ratio_sample", "sample_num"],
-)
-
-# # Saving files
-da_zone_data.to_netcdf(os.path.join(os.getcwd(), PATH_SAMPLE, "sampled_zone_data.nc"))
-da_bus_data.to_netcdf(os.path.join(os.getcwd(), PATH_SAMPLE, "sampled_bus_data.nc"))
-da_ratios.to_netcdf(os.path.join(os.getcwd(), PATH_SAMPLE, "sampled_ratio_data.nc"))
-np.save(
-    os.path.join(os.getcwd(), PATH_SAMPLE, "combined_gen_samples.npy"),
-    combined_gen_samples,
-)
-np.save(
-    os.path.join(os.getcwd(), PATH_SAMPLE, "combined_ratio_samples.npy"),
-    ratio_samples_combined,
-)
+            sampled_wind_generatorlvl = wind_allocation.downscale(sampled_wind)
+
+            # Combine load solar wind data into one array for each sample
+            bus_sample = np.zeros(
+                [num_hours, len(df_bus_coordinates), 3],
+            )  # Dimensions are (t, node, profile type)
+            bus_sample[:, load_inds_combined, 0] = sampled_load.values[
+                :,
+                load_inds_orig,
+            ]
+            bus_sample[:, solar_inds_combined, 1] = sampled_solar_generatorlvl.values[
+                :,
+                solar_inds_orig,
+            ]
+            bus_sample[:, wind_inds_combined, 2] = sampled_wind_generatorlvl.values[
+                :,
+                wind_inds_orig,
+            ]
+            bus_writer.append(sample_num, bus_sample)
+
+            zone_sample = np.zeros(
+                [num_hours, len(zone_coords), 2],
+            )  # Dimensions are (t, zone, profile type)
+            zone_sample[:, solar_zone_inds_combined, 0] = sampled_solar.values[
+                :,
+                solar_zone_inds_orig,
+            ]
+            zone_sample[:, wind_zone_inds_combined, 1] = sampled_wind.values[
+                :,
+                wind_zone_inds_orig,
+            ]
+            zone_writer.append(sample_num, zone_sample)
+
+            # Generator level availability, as in n.generators_t.p_max_pu
+            generator_writer.append(
+                sample_num,
+                np.hstack(
+                    [
+                        sampled_solar_generatorlvl.values,
+                        sampled_wind_generatorlvl.values,
+                    ],
+                ),
+            )
+
+    print(f"Sampling time : {time.time() - start_time}")
@@ -12,7 +12,7 @@ import seaborn as sns
 logger = logging.getLogger(__name__)
 from _helpers import configure_logging
 from constants import EIA_930_REGION_MAPPER, EIA_BA_2_REGION, STATE_2_CODE
-from eia import Emissions
+from eia import Emissions, configure_cache
 from plot_network_maps import (
     create_title,
     get_bus_scale,
@@ -679,6 +679,7 @@ def plot_ba_emissions_historical_bar(
 
 def main(snakemake):
     configure_logging(snakemake)
+    configure_cache(**snakemake.config["api"].get("eia_cache", {}))
     n = pypsa.Network(snakemake.input.network)
     snapshots = n.snapshots
 
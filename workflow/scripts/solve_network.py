@@ -25,8 +25,10 @@ Additionally, some extra constraints specified in :mod:`solve_network` are added
     the workflow for all scenarios in the configuration file (``scenario:``)
     based on the rule :mod:`solve_network`.
 """
+import copy
 import logging
 import re
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import pandas as pd
@@ -908,6 +910,234 @@ def solve_network(n, config, solving, opts="", **kwargs):
     return n
 
 
+def apply_sample_profiles(n, load, p_max_pu):
+    """
+    Overwrites load and renewable availability time series with those of a
+    stochastic sample.
+
+    Samples are aligned to the network snapshots by month, day and hour, so
+    that the sampled year may differ from the snapshot year. Loads and
+    generators without a sampled profile keep their original time series.
+    """
+    snapshots = n.snapshots
+    if isinstance(snapshots, pd.MultiIndex):
+        snapshots = snapshots.get_level_values(-1)
+
+    loads = load.columns.intersection(n.loads_t.p_set.columns)
+    load = align_sample_to_snapshots(load, snapshots)
+    n.loads_t.p_set.loc[:, loads] = load[loads].values
+
+    gens = p_max_pu.columns.intersection(n.generators_t.p_max_pu.columns)
+    p_max_pu = align_sample_to_snapshots(p_max_pu, snapshots)
+    n.generators_t.p_max_pu.loc[:, gens] = p_max_pu[gens].values
+
+
+def align_sample_to_snapshots(sample, snapshots):
+    """
+    Selects the rows of a sample indexed by timestamp matching the month, day
+    and hour of each snapshot.
+    """
+
+    def hour_of_year(index):
+        index = pd.DatetimeIndex(index)
+        return index.month * 10000 + index.day * 100 + index.hour
+
+    positions = pd.Index(hour_of_year(sample.index)).get_indexer(
+        hour_of_year(snapshots),
+    )
+    if (positions < 0).any():
+        missing = snapshots[positions < 0]
+        raise ValueError(
+            f"Sample does not cover {len(missing)} network snapshots, "
+            f"starting at {missing[0]}",
+        )
+    return sample.iloc[positions]
+
+
+def get_curtailment(n):
+    """
+    Returns the curtailed energy in MWh of generators with time varying
+    availability, by carrier.
+    """
+    gens = n.generators_t.p_max_pu.columns
+    available = n.generators_t.p_max_pu * n.generators.p_nom_opt[gens]
+    curtailed = (available - n.generators_t.p[gens]).clip(lower=0)
+    curtailed = curtailed.mul(n.snapshot_weightings.generators, axis=0).sum()
+    return curtailed.groupby(n.generators.carrier[gens]).sum()
+
+
+_ensemble = {}
+
+
+def _init_ensemble_worker(
+    smk,
+    network_path,
+    bus_data_path,
+    generator_data_path,
+    solve_opts,
+    config,
+    solving,
+    opts,
+    foresight,
+    planning_horizons,
+    co2_sequestration_potential,
+):
+    # the constraints read inputs and params from the global snakemake object,
+    # which workers only inherit with the fork start method
+    globals()["snakemake"] = smk
+
+    # every worker prepares an identical network, including the noisy costs
+    np.random.seed(solve_opts.get("seed", 123))
+    n = pypsa.Network(network_path)
+    n.optimize.fix_optimal_capacities()
+    n = prepare_network(
+        n,
+        solve_opts,
+        config=config,
+        foresight=foresight,
+        planning_horizons=planning_horizons,
+        co2_sequestration_potential=co2_sequestration_potential,
+    )
+    _ensemble.update(
+        network=n,
+        load=xr.open_dataarray(bus_data_path).sel(profile_type="load"),
+        p_max_pu=xr.open_dataarray(generator_data_path),
+        clip_p_max_pu=solve_opts.get("clip_p_max_pu"),
+        config=config,
+        solving=solving,
+        opts=opts,
+    )
+
+
+def _ensemble_coords():
+    n = _ensemble["network"]
+    snapshots = n.snapshots
+    if isinstance(snapshots, pd.MultiIndex):
+        snapshots = snapshots.get_level_values(-1)
+    return snapshots, n.buses.index
+
+
+def _solve_ensemble_sample(sample_num):
+    n = _ensemble["network"]
+    try:
+        load = _ensemble["load"].sel(sample_num=sample_num).to_pandas()
+        p_max_pu = _ensemble["p_max_pu"].sel(sample_num=sample_num).to_pandas()
+        apply_sample_profiles(n, load, p_max_pu)
+        if _ensemble["clip_p_max_pu"]:
+            n.generators_t.p_max_pu.where(
+                n.generators_t.p_max_pu > _ensemble["clip_p_max_pu"],
+                other=0.0,
+                inplace=True,
+            )
+
+        # solve_network pops options, so every sample gets a fresh copy
+        solve_network(
+            n,
+            config=_ensemble["config"],
+            solving=copy.deepcopy(_ensemble["solving"]),
+            opts=_ensemble["opts"],
+        )
+    except Exception:
+        # a failed sample must not discard the other samples of the ensemble
+        logger.exception(f"Solving sample {sample_num} failed")
+        return (
+            np.nan,
+            np.full((len(n.snapshots), len(n.buses)), np.nan),
+            pd.Series(dtype=float),
+        )
+    return (
+        n.objective,
+        n.buses_t.marginal_price.reindex(columns=n.buses.index).values,
+        get_curtailment(n),
+    )
+
+
+def solve_ensemble(
+    network_path,
+    bus_data_path,
+    generator_data_path,
+    workers=1,
+    **kwargs,
+):
+    """
+    Solves the dispatch of a solved network for every stochastic sample.
+
+    Each worker loads and prepares the network once, fixes the optimal
+    capacities and then solves one sample after another, only overwriting
+    ``loads_t.p_set`` and ``generators_t.p_max_pu``. Samples that fail to
+    solve are logged and get NaN results.
+
+    Parameters
+    ----------
+    network_path : str
+        Path to the solved network.
+    bus_data_path : str
+        Sampled bus data written by generate_stochastic_samples.
+    generator_data_path : str
+        Sampled generator p_max_pu written by generate_stochastic_samples.
+    workers : int
+        Number of samples solved in parallel.
+    **kwargs
+        Passed to ``prepare_network`` and ``solve_network``.
+
+    Returns
+    -------
+    xr.Dataset
+        Objective, locational marginal prices and curtailment by carrier for
+        every sample.
+    """
+    with xr.open_dataarray(generator_data_path) as p_max_pu:
+        sample_nums = p_max_pu.sample_num.values
+
+    initargs = (snakemake, network_path, bus_data_path, generator_data_path) + tuple(
+        kwargs[arg]
+        for arg in [
+            "solve_opts",
+            "config",
+            "solving",
+            "opts",
+            "foresight",
+            "planning_horizons",
+            "co2_sequestration_potential",
+        ]
+    )
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_ensemble_worker,
+        initargs=initargs,
+    ) as executor:
+        results = list(executor.map(_solve_ensemble_sample, sample_nums))
+        snapshots, buses = executor.submit(_ensemble_coords).result()
+
+    objective, marginal_price, curtailment = zip(*results)
+    failed = np.isnan(np.array(objective, dtype=float))
+    if failed.any():
+        logger.warning(f"{failed.sum()} of {len(failed)} samples failed to solve")
+    curtailment = pd.concat(curtailment, axis=1, keys=range(len(curtailment))).T
+    curtailment = curtailment.fillna(0)
+    curtailment.loc[failed] = np.nan
+
+    return xr.Dataset(
+        {
+            "objective": ("sample_num", np.array(objective)),
+            "marginal_price": (
+                ("sample_num", "snapshot", "bus"),
+                np.stack(marginal_price).astype(np.float32),
+            ),
+            "curtailment": (
+                ("sample_num", "carrier"),
+                curtailment.values,
+            ),
+        },
+        coords={
+            "sample_num": sample_nums,
+            "snapshot": snapshots,
+            "bus": buses,
+            "carrier": curtailment.columns,
+        },
+    )
+
+
 if __name__ == "__main__":
     if "snakemake" not in globals():
         from _helpers import mock_snakemake
@@ -938,24 +1168,41 @@ if __name__ == "__main__":
 
     np.random.seed(solve_opts.get("seed", 123))
 
-    n = pypsa.Network(snakemake.input.network)
-
-    n = prepare_network(
-        n,
-        solve_opts,
-        config=snakemake.config,
-        foresight=snakemake.params.foresight,
-        planning_horizons=snakemake.params.planning_horizons,
-        co2_sequestration_potential=snakemake.params["co2_sequestration_potential"],
-    )
+    if snakemake.rule == "solve_network_ensemble":
+        ds = solve_ensemble(
+            snakemake.input.network,
+            snakemake.input.bus_data,
+            snakemake.input.generator_data,
+            workers=snakemake.params.solving.get("ensemble", {}).get("workers", 1),
+            solve_opts=solve_opts,
+            config=snakemake.config,
+            solving=snakemake.params.solving,
+            opts=opts,
+            foresight=snakemake.params.foresight,
+            planning_horizons=snakemake.params.planning_horizons,
+            co2_sequestration_potential=snakemake.params["co2_sequestration_potential"],
+        )
+        encoding = {var: {"zlib": True, "complevel": 4} for var in ds.data_vars}
+        ds.to_netcdf(snakemake.output[0], encoding=encoding)
+    else:
+        n = pypsa.Network(snakemake.input.network)
+
+        n = prepare_network(
+            n,
+            solve_opts,
+            config=snakemake.config,
+            foresight=snakemake.params.foresight,
+            planning_horizons=snakemake.params.planning_horizons,
+            co2_sequestration_potential=snakemake.params["co2_sequestration_potential"],
+        )
 
-    n = solve_network(
-        n,
-        config=snakemake.config,
-        solving=snakemake.params.solving,
-        opts=opts,
-        log_fn=snakemake.log.solver,
-    )
+        n = solve_network(
+            n,
+            config=snakemake.config,
+            solving=snakemake.params.solving,
+            opts=opts,
+            log_fn=snakemake.log.solver,
+        )
 
-    n.meta = dict(snakemake.config, **dict(wildcards=dict(snakemake.wildcards)))
-    n.export_to_netcdf(snakemake.output[0])
+        n.meta = dict(snakemake.config, **dict(wildcards=dict(snakemake.wildcards)))
+        n.export_to_netcdf(snakemake.output[0])
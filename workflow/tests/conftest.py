@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+# the scripts import each other as top-level modules, as under snakemake
+sys.path.insert(0, str(Path(__file__).parents[1] / "scripts"))
+
+# test_yaml_structure is run as a script from the workflow directory
+collect_ignore = ["test_yaml_structure.py"]
+
+
+@pytest.fixture
+def cutout_path(tmp_path):
+    """
+    Path of a small prepared wind cutout of two months in the atlite format.
+    """
+    x, y = np.arange(-100, -98, 0.25), np.arange(30, 31.5, 0.25)
+    time = pd.date_range("2019-01-01", "2019-02-28 23:00", freq="h")
+    rng = np.random.default_rng(0)
+    attrs = {"feature": "wind", "module": "era5"}
+    ds = xr.Dataset(
+        {
+            "wnd100m": (
+                ("time", "y", "x"),
+                rng.gamma(3, 3, (len(time), len(y), len(x))).astype("float32"),
+                attrs,
+            ),
+            "roughness": (("y", "x"), np.full((len(y), len(x)), 0.1), attrs),
+        },
+        coords={"x": x, "y": y, "time": time, "lon": ("x", x), "lat": ("y", y)},
+        attrs={
+            "module": "era5",
+            "prepared_features": ["wind"],
+            "dx": 0.25,
+            "dy": 0.25,
+            "dt": "h",
+        },
+    )
+    path = tmp_path / "cutout.nc"
+    ds.to_netcdf(path)
+    return path
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pypsa")
+import shapely
+from build_bus_regions import partition_regions
+
+
+def test_partition_regions():
+    rng = np.random.default_rng(0)
+    outlines = [shapely.box(0, 0, 4, 2), shapely.Point(10, 10).buffer(3)]
+    points = [
+        rng.uniform([0, 0], [4, 2], size=(20, 2)),
+        rng.uniform(8, 12, size=(5, 2)),
+    ]
+    points.append(np.array([[1.0, 1.0]]))
+    outlines.append(shapely.box(0, 0, 2, 2))
+
+    partitions = partition_regions(points, outlines)
+    for pts, outline, polygons in zip(points, outlines, partitions):
+        assert len(polygons) == len(pts)
+        assert shapely.contains(polygons, shapely.points(pts)).all()
+        assert np.isclose(shapely.area(polygons).sum(), outline.area)
+        assert np.isclose(shapely.union_all(polygons).area, outline.area)
+
+    parallel = partition_regions(points, outlines, workers=2)
+    for polygons, expected in zip(parallel, partitions):
+        assert shapely.equals(polygons, expected).all()
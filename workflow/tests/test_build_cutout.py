@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+atlite = pytest.importorskip("atlite")
+from build_cutout import slice_cutout
+
+
+def test_slice_cutout(cutout_path, tmp_path):
+    path = tmp_path / "sliced.nc"
+    slice_cutout(cutout_path, path, slice(-99.5, -98.5), slice(30.5, 31.0))
+
+    national, sliced = atlite.Cutout(cutout_path), atlite.Cutout(path)
+    np.testing.assert_allclose(sliced.data.x, [-99.5, -99.25, -99.0, -98.75, -98.5])
+    np.testing.assert_allclose(sliced.data.y, [30.5, 30.75, 31.0])
+    np.testing.assert_array_equal(
+        sliced.data.wnd100m,
+        national.data.wnd100m.sel(x=slice(-99.5, -98.5), y=slice(30.5, 31.0)),
+    )
+
+
+@pytest.mark.parametrize(
+    "x, y",
+    [
+        (slice(-101, -99), slice(30, 31)),
+        (slice(-99, -98), slice(31, 32)),
+        (slice(None, -95), slice(30, 31)),
+    ],
+)
+def test_slice_cutout_outside_extent(cutout_path, tmp_path, x, y):
+    with pytest.raises(ValueError, match="exceeds the extent"):
+        slice_cutout(cutout_path, tmp_path / "sliced.nc", x, y)
+    assert not (tmp_path / "sliced.nc").exists()
+
+
+def test_slice_cutout_resolution(cutout_path, tmp_path):
+    with pytest.raises(ValueError, match="differs from the resolution"):
+        slice_cutout(
+            cutout_path, tmp_path / "sliced.nc", slice(-99, -98), slice(30, 31), dx=0.3
+        )
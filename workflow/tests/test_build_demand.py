@@ -0,0 +1,109 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pypsa")
+from build_demand import ReadEfs, WritePopulation
+from build_efs_dataset import PARTITIONS
+
+
+@pytest.fixture
+def efs_dataset(tmp_path):
+    efs = pd.DataFrame(
+        [
+            (year, hour, state, sector, "all", 100 * hour)
+            for year in (2030, 2040)
+            for hour in (1, 2, 3)
+            for state in ("TX", "CA")
+            for sector in ("Commercial", "Residential")
+        ],
+        columns=ReadEfs.COLUMNS,
+    )
+    path = tmp_path / "efs"
+    efs.to_parquet(path, partition_cols=PARTITIONS, index=False)
+    return path
+
+
+@pytest.fixture
+def network():
+    buses = pd.DataFrame(
+        {
+            "balancing_area": [
+                "PJM_East",
+                "CISO-PGAE",
+                "PJM_West",
+                "CISO-SDGE",
+                "ERCO",
+            ],
+            "Pd": [10.0, 30.0, 30.0, 10.0, 5.0],
+        },
+        index=["bus4", "bus2", "bus1", "bus3", "bus5"],
+    )
+    return SimpleNamespace(buses=buses)
+
+
+def test_get_disaggregation(network):
+    zones, buses, matrix = WritePopulation(network)._get_disaggregation("ba")
+    assert list(zones) == ["PJM", "CISO", "ERCO"]
+    assert list(buses) == ["bus1", "bus4", "bus2", "bus3", "bus5"]
+    np.testing.assert_allclose(
+        matrix.toarray(),
+        [[0.75, 0.25, 0, 0, 0], [0, 0, 0.75, 0.25, 0], [0, 0, 0, 0, 1]],
+    )
+    # every zone is fully allocated to its buses
+    np.testing.assert_allclose(matrix.sum(axis=1).A1, 1)
+
+
+def test_disaggregate_demand_to_buses(network):
+    index = pd.date_range("2019-01-01", periods=3, freq="h", name="snapshot")
+    demand = pd.DataFrame(
+        {"CISO": [100.0, 120.0, 90.0], "ERCO": [50.0, 0.0, 10.0], "PJM": 1.0},
+        index=index,
+    )
+    strategy = WritePopulation(network)
+    load = strategy._disaggregate_demand_to_buses(demand, "ba")
+
+    zones = strategy._get_load_dissagregation_zones("ba")
+    pd.testing.assert_frame_equal(
+        load.T.groupby(zones).sum().T,
+        demand,
+        check_names=False,
+        check_like=True,
+    )
+
+
+def test_read_efs_filters(efs_dataset):
+    df = ReadEfs(str(efs_dataset), years=[2040], states=["TX"])._read_data()
+    assert len(df) == 6
+    assert (df.Year == 2040).all() and (df.State == "TX").all()
+    assert df.Year.dtype == int and df.Sector.dtype == object
+
+    demand = ReadEfs(str(efs_dataset), years=[2030]).read_demand()
+    assert sorted(demand.columns) == ["California", "Texas"]
+    assert (demand.index.get_level_values("snapshot").year == 2030).all()
+    assert set(demand.index.get_level_values("sector")) == {"commercial", "residential"}
+
+
+def test_read_demand_cache(efs_dataset, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    reader = ReadEfs(str(efs_dataset), years=[2030], cache_dir=str(cache_dir))
+    demand = reader.read_demand()
+    cache = reader._cache_path()
+    assert cache.exists()
+
+    def read_data(self):
+        raise AssertionError("source read despite cache")
+
+    monkeypatch.setattr(ReadEfs, "_read_data", read_data)
+    pd.testing.assert_frame_equal(reader.read_demand(), demand)
+
+    # reader options and changes of the source lead to another cache file
+    other = ReadEfs(str(efs_dataset), years=[2040], cache_dir=str(cache_dir))
+    assert other._cache_path() != cache
+    source = next(p for p in efs_dataset.rglob("*") if p.is_file())
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert reader._cache_path() != cache
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+atlite = pytest.importorskip("atlite")
+import build_renewable_profiles
+from build_renewable_profiles import _fingerprint_entry, shared_cutout_features
+
+
+def test_fingerprint_entry_raster(tmp_path, monkeypatch):
+    raster = tmp_path / "raster.tif"
+    raster.write_bytes(b"\0" * 1024)
+
+    # rasters are identified without reading their content
+    monkeypatch.setattr(build_renewable_profiles, "file_checksum", None)
+    entry = {"raster": str(raster), "codes": [1, 2], "buffer": 0}
+    key = _fingerprint_entry(entry, "raster")
+    assert key == _fingerprint_entry(dict(reversed(entry.items())), "raster")
+    assert key != _fingerprint_entry({**entry, "buffer": 100}, "raster")
+
+    stat = raster.stat()
+    os.utime(raster, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    touched = _fingerprint_entry(entry, "raster")
+    assert touched != key
+
+    raster.write_bytes(b"\0" * 2048)
+    os.utime(raster, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert _fingerprint_entry(entry, "raster") != touched
+
+
+def test_shared_cutout_features(cutout_path):
+    cutout = atlite.Cutout(cutout_path)
+    assert cutout.data.wnd100m.chunks is not None
+
+    with shared_cutout_features(cutout, ["wind"]):
+        assert cutout.data.wnd100m.chunks is not None
+
+    with shared_cutout_features(cutout, ["wind", "wind"]):
+        assert cutout.data.wnd100m.chunks is None
+        assert cutout.data.roughness.chunks is None
+    # the variables are read lazily again after the context
+    assert cutout.data.wnd100m.chunks is not None
@@ -0,0 +1,59 @@
+import os
+import time
+
+import eia
+import pytest
+import requests
+from eia import DataExtractor, configure_cache
+
+URL = (
+    "https://api.eia.gov/v2/electricity/rto/region-data/data/?api_key={}"
+    "&facets[respondent][]=ERCO&facets[respondent][]=CISO&frequency=hourly"
+)
+
+
+def test_cache_key():
+    key = DataExtractor._cache_key(URL.format("secret"))
+    assert "secret" not in key and "api_key" not in key
+    assert key == DataExtractor._cache_key(URL.format("other"))
+    assert key.count("respondent") == 2 and "frequency=hourly" in key
+
+
+@pytest.fixture
+def requests_made(monkeypatch):
+    monkeypatch.setattr(eia, "CACHE", dict(eia.CACHE))
+    made = []
+
+    def get_eia_data(url):
+        made.append(url)
+        return {"response": {"data": [{"value": len(made)}]}}
+
+    monkeypatch.setattr(DataExtractor, "_get_eia_data", staticmethod(get_eia_data))
+    return made
+
+
+def test_request_eia_data_cache(tmp_path, requests_made):
+    configure_cache(cache_dir=str(tmp_path), ttl=1)
+    data = DataExtractor._request_eia_data(URL.format("secret"))
+    assert DataExtractor._request_eia_data(URL.format("other")) == data
+    assert len(requests_made) == 1
+    assert not any(
+        "secret" in f.read_bytes().decode("latin-1") for f in tmp_path.iterdir()
+    )
+
+    # responses older than the ttl are requested again
+    (path,) = tmp_path.iterdir()
+    expired = time.time() - 2 * 86400
+    os.utime(path, (expired, expired))
+    assert DataExtractor._request_eia_data(URL.format("secret")) != data
+    assert len(requests_made) == 2
+
+
+def test_request_eia_data_offline(tmp_path, requests_made):
+    with pytest.raises(ValueError):
+        configure_cache(offline=True)
+
+    configure_cache(cache_dir=str(tmp_path), offline=True)
+    with pytest.raises(requests.ConnectionError, match="offline"):
+        DataExtractor._request_eia_data(URL.format("secret"))
+    assert not requests_made
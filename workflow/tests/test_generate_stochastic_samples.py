@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+import pytest
+from generate_stochastic_samples import (
+    define_solar_hours,
+    resample_ratio,
+    sample_ratios,
+    truncated_resample_ratio,
+)
+
+
+def sampler_arrays(n_hours=24 * 7):
+    sampling_ids = ["load_1", "wind_1", "solar_daily_1", "load_daily_1"]
+    n_ids = len(sampling_ids)
+    solar_reset = np.zeros(n_hours, dtype=bool)
+    solar_reset[30::24] = True
+    return {
+        "sampling_ids": sampling_ids,
+        "mu": np.array([[0.9, 0.4, 0.6, 1.0], [1.1, 0.5, 0.8, 0.9]]),
+        "kai": np.full((2, n_ids), 0.3),
+        "sigma": np.full((2, n_ids), 0.2),
+        "thresholds": np.array([1.5, 1.0, 1.0, 1.5]),
+        "daily": pd.Index(sampling_ids).str.contains("daily"),
+        "solar": pd.Index(sampling_ids).str.contains("solar"),
+        "season_idx": np.arange(n_hours) * 2 // n_hours,
+        "solar_reset": solar_reset,
+    }
+
+
+@pytest.mark.parametrize("resample_method", ["truncated", "rejection"])
+def test_sample_ratios(resample_method):
+    arrays = sampler_arrays()
+    ratio, epsilon = sample_ratios(
+        arrays,
+        np.random.default_rng(1),
+        resample_method=resample_method,
+    )
+    assert ratio.shape == epsilon.shape == (24 * 7, 4)
+    assert (ratio >= 0).all() and (ratio <= arrays["thresholds"]).all()
+
+    # daily columns are only redrawn at midnight, solar ones also on reset hours
+    days = ratio.reshape(7, 24, 4)
+    load_daily, solar_daily = days[..., 3], days[..., 2]
+    assert (load_daily == load_daily[:, :1]).all()
+    assert (solar_daily[:, :6] == solar_daily[:, :1]).all()
+    assert (solar_daily[:, 7:] == solar_daily[:, 6:7]).all()
+    assert (solar_daily[1:, 6] != solar_daily[1:, 5]).all()
+    assert (np.diff(days[..., 1], axis=1) != 0).any()
+
+    again, _ = sample_ratios(
+        arrays,
+        np.random.default_rng(1),
+        resample_method=resample_method,
+    )
+    np.testing.assert_array_equal(ratio, again)
+
+
+def out_of_bounds(base, sigma, threshold, epsilon, n):
+    return (
+        np.full(n, base + epsilon),
+        np.full(n, sigma),
+        np.full(n, threshold),
+        np.full(n, epsilon),
+    )
+
+
+@pytest.mark.parametrize("base, bound", [(50.0, 5.0), (-40.0, 0.0)])
+def test_truncated_resample_ratio_tails(base, bound):
+    # bounds over 40 sigma away from the mean, where the normal cdf of both
+    # bounds rounds to the same value
+    ratio, sigma, thresholds, epsilon = out_of_bounds(base, 1.0, 5.0, 1.0, 1000)
+    resampled, resampled_epsilon, _ = truncated_resample_ratio(
+        ratio,
+        sigma,
+        thresholds,
+        epsilon,
+        np.random.default_rng(0),
+    )
+    assert np.isfinite(resampled).all()
+    assert (resampled >= 0).all() and (resampled <= 5.0).all()
+    np.testing.assert_allclose(base + resampled_epsilon, resampled, atol=1e-9)
+    # deep in the tail the distance to the bound is about exponential
+    distance = np.abs(resampled - bound)
+    np.testing.assert_allclose(distance.mean(), 1 / abs(base - bound), rtol=0.1)
+
+
+def test_truncated_resample_ratio_keeps_in_bounds_values():
+    ratio = np.array([0.5, 1.2, -0.1])
+    epsilon = np.array([0.1, 0.3, -0.2])
+    resampled, resampled_epsilon, _ = truncated_resample_ratio(
+        ratio,
+        np.full(3, 0.2),
+        np.full(3, 1.0),
+        epsilon,
+        np.random.default_rng(0),
+    )
+    assert resampled[0] == 0.5 and resampled_epsilon[0] == 0.1
+    assert (resampled[1:] >= 0).all() and (resampled[1:] <= 1.0).all()
+
+
+@pytest.mark.parametrize("base", [0.5, 1.3, -0.2])
+def test_truncated_resample_ratio_matches_rejection(base):
+    stats = pytest.importorskip("scipy.stats")
+    args = out_of_bounds(base, 0.3, 1.0, 2.0, 20000)
+    truncated, _, _ = truncated_resample_ratio(*args, np.random.default_rng(0))
+    rejection, _, _ = resample_ratio(*args, np.random.default_rng(1))
+    assert stats.ks_2samp(truncated, rejection).pvalue > 0.001
+
+
+def define_solar_hours_loop(solar_profile, hours_per_day=24):
+    # previous day by day implementation for a single area
+    first_hour, last_hour, yesterday_last_hour = np.zeros((3, len(solar_profile)))
+    last_selected_index = 0
+    solar_profile = pd.Series(solar_profile)
+    for _, day in solar_profile.groupby(solar_profile.index // hours_per_day):
+        first_hour_idx = day.idxmax()
+        last_hour_idx = day[::-1].idxmax()
+        start_hour = day.idxmin()
+        first_hour[first_hour_idx] = 1
+        yesterday_last_hour[first_hour_idx] = (
+            0 if start_hour < hours_per_day - 1 else last_selected_index
+        )
+        last_hour[last_hour_idx] = 1
+        last_selected_index = last_hour_idx
+    return first_hour, last_hour, yesterday_last_hour
+
+
+@pytest.mark.parametrize("n_hours", [24 * 10, 24 * 10 - 5])
+def test_define_solar_hours_matches_loop(n_hours):
+    rng = np.random.default_rng(0)
+    hour = np.arange(n_hours) % 24
+    sunrise, sunset = rng.integers(4, 9, size=4), rng.integers(16, 21, size=4)
+    mask = ((hour[:, None] >= sunrise) & (hour[:, None] < sunset)).astype(int)
+    mask[48:72, 1] = 0  # a day without sun
+    mask[:, 2] = 1  # and a column that is never dark
+
+    result = define_solar_hours(pd.DataFrame(mask))
+    for area in range(mask.shape[1]):
+        expected = define_solar_hours_loop(mask[:, area])
+        for actual, reference in zip(result, expected):
+            np.testing.assert_array_equal(actual[:, area], reference)
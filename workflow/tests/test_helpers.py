@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+import shapely
+from _helpers import BusGeocoder, read_demand, write_demand
+
+
+@pytest.fixture
+def geocoder():
+    shapes = gpd.GeoDataFrame(
+        {"name": ["west", "overlap", "east"]},
+        geometry=[
+            shapely.box(0, 0, 2, 2),
+            shapely.box(1, 0, 3, 2),
+            shapely.box(4, 0, 6, 2),
+        ],
+    )
+    return BusGeocoder(crs=None).add_layer("zone", shapes, ["name"])
+
+
+def test_bus_geocoder_match(geocoder):
+    points = shapely.points([(0.5, 1), (1.5, 1), (2.5, 1), (5, 1), (3.7, 1), (8, 1)])
+    np.testing.assert_array_equal(
+        geocoder.match(points, "zone"),
+        [0, 0, 1, 2, -1, -1],
+    )
+    np.testing.assert_array_equal(
+        geocoder.match(points, "zone", nearest=True),
+        [0, 0, 1, 2, 2, 2],
+    )
+
+
+def test_bus_geocoder_match_missing(geocoder):
+    points = np.array([None, shapely.Point(), shapely.Point(3.2, 1)], dtype=object)
+    np.testing.assert_array_equal(
+        geocoder.match(points, "zone", nearest=True),
+        [-1, -1, 1],
+    )
+
+
+def test_bus_geocoder_assign(geocoder):
+    points = gpd.GeoSeries(shapely.points([(0.5, 1), (8, 1)]), index=["a", "b"])
+    assigned = geocoder.assign(points)
+    assert assigned.index.tolist() == ["a", "b"]
+    assert assigned.name["a"] == "west" and assigned.name.isna()["b"]
+    assert geocoder.assign(points, nearest=True).name["b"] == "east"
+
+
+def test_write_read_demand(tmp_path):
+    index = pd.date_range("2030-01-01", periods=48, freq="h", name="snapshot")
+    demand = pd.DataFrame(
+        np.random.default_rng(0).uniform(0, 1000, size=(48, 3)),
+        index=index,
+        columns=["p1", "p2", "p10"],
+    )
+    write_demand(demand, tmp_path / "demand.arrow", csv=tmp_path / "demand.csv")
+
+    loaded = read_demand(tmp_path / "demand.arrow")
+    assert (loaded.dtypes == "float32").all()
+    assert loaded.index.equals(index) and list(loaded.columns) == list(demand.columns)
+    np.testing.assert_allclose(loaded, demand, rtol=1e-6)
+    assert (tmp_path / "demand.csv").exists()
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pypsa")
+from solve_network import align_sample_to_snapshots
+
+
+def test_align_sample_to_snapshots():
+    index = pd.date_range("2019-01-01", periods=24 * 365, freq="h")
+    sample = pd.DataFrame({"bus": np.arange(len(index))}, index=index)
+    snapshots = pd.date_range("2030-03-05 10:00", periods=48, freq="h")[::3]
+
+    aligned = align_sample_to_snapshots(sample, snapshots)
+    assert (aligned.index.month == snapshots.month).all()
+    assert (aligned.index.day == snapshots.day).all()
+    assert (aligned.index.hour == snapshots.hour).all()
+    np.testing.assert_array_equal(
+        aligned.bus,
+        sample.index.get_indexer(snapshots - pd.DateOffset(years=11)),
+    )
+
+
+def test_align_sample_to_snapshots_missing():
+    index = pd.date_range("2019-01-01", periods=24 * 365, freq="h")
+    sample = pd.DataFrame({"bus": 1.0}, index=index)
+    snapshots = pd.date_range("2020-02-28", periods=72, freq="h")
+    with pytest.raises(ValueError, match="does not cover 24 network snapshots"):
+        align_sample_to_snapshots(sample, snapshots)